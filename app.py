@@ -1,17 +1,41 @@
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, request, jsonify, render_template, Response, stream_with_context
 from flask_cors import CORS
-import mysql.connector
 from mysql.connector import Error
 import google.generativeai as genai
 import os
 import json
+import threading
+import time
+import atexit
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from dotenv import load_dotenv
-import re
+from db_pool import ConnectionPool
+from cache import TTLCache
+from order_filter import OrderIdPrefilter
+from order_snapshot import OrderSnapshot
+from knowledge_base import KnowledgeBaseIndex
+from llm_cache import LLMResponseCache, payload_hash
+from semantic_cache import SemanticCache
+from ticket_queue import TicketWriteQueue, TICKET_PENDING
+from conversation_log import ConversationLogger
+from session_store import SessionStore, MemorySessionBackend, MySQLSessionBackend
+from metrics import registry as metrics_registry, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from metrics import (STAGE_SECONDS, TURN_SECONDS, DB_ERRORS, LLM_FALLBACKS, LLM_QUEUE_SECONDS, LLM_GUARD_TRIPS,
+                     COALESCED_REQUESTS, PROMPT_TOKENS)
+from prompt_builder import PromptBuilder
+from json_provider import FastJSONProvider, plain_row
+from reply_templates import TemplateRegistry, ResponseBodyCache, DEFAULT_TEMPLATES
+from singleflight import SingleFlight
+from llm_guard import LLMGuard, CircuitBreaker, LLMUnavailable
+from tracing import Tracer, traced, span, add_span
+from intents import classify_message, contains_any, CANCEL_CONFIRM_WORDS, ADDRESS_CONFIRM_WORDS
 
 load_dotenv()
 
 app = Flask(__name__)
+app.json = FastJSONProvider(app, backend=os.getenv('JSON_BACKEND', 'auto'))
 CORS(app)
 
 genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
@@ -24,6 +48,21 @@ DB_CONFIG = {
     'database': os.getenv('DB_NAME', 'ecommerce_support')
 }
 
+db_pool = ConnectionPool(
+    DB_CONFIG,
+    size=int(os.getenv('DB_POOL_SIZE', '5')),
+    timeout=float(os.getenv('DB_POOL_TIMEOUT', '5')),
+    recycle=int(os.getenv('DB_POOL_RECYCLE', '1800')),
+    health_check_idle=float(os.getenv('DB_POOL_HEALTH_CHECK_IDLE', '30'))
+)
+
+order_cache = TTLCache(
+    max_size=int(os.getenv('ORDER_CACHE_SIZE', '1024')),
+    ttl=float(os.getenv('ORDER_CACHE_TTL', '120'))
+)
+
+ORDER_FILTER_ENABLED = os.getenv('ORDER_FILTER_ENABLED', 'true').lower() == 'true'
+
 KNOWLEDGE_BASE = {
     'return_policy': 'You can return items within 30 days of delivery. Items must be unused and in original packaging. Visit our Returns page or contact support with your order number.',
     'shipping_options': 'We offer Standard (5-7 days, ₹400), Express (2-3 days, ₹1,200), and Overnight shipping (₹2,000). Shipping costs may vary by location.',
@@ -35,18 +74,102 @@ KNOWLEDGE_BASE = {
     'refund_process': 'Refunds are processed within 5-7 business days after we receive your returned item. You\'ll receive an email confirmation.'
 }
 
+# Built once at startup; KB_FILE articles are merged over the seed above and hot-reloaded
+kb_index = KnowledgeBaseIndex(
+    KNOWLEDGE_BASE,
+    path=os.getenv('KB_FILE'),
+    body_min_score=float(os.getenv('KB_BODY_MIN_SCORE', '3')),
+    reload_interval=float(os.getenv('KB_RELOAD_INTERVAL', '5'))
+)
+KB_TOP_K = int(os.getenv('KB_TOP_K', '3'))
+
+# Reply copy, parsed once at startup; TEMPLATES_FILE overrides are hot-reloaded
+templates = TemplateRegistry(
+    DEFAULT_TEMPLATES,
+    path=os.getenv('TEMPLATES_FILE'),
+    reload_interval=float(os.getenv('TEMPLATES_RELOAD_INTERVAL', '5'))
+)
+
+# Replies drawn from a fixed set of texts (templates, knowledge base articles) are serialized once
+CACHEABLE_REPLY_TYPES = frozenset({'clarification', 'knowledge_base_response', 'general'})
+# Compact separators, as jsonify() writes them, so cached and fresh bodies are byte-identical
+response_bodies = ResponseBodyCache(lambda obj: app.json.dumps(obj, separators=(',', ':')),
+                                    max_size=int(os.getenv('RESPONSE_BODY_CACHE_SIZE', '1024')))
+
+llm_cache = LLMResponseCache(
+    max_size=int(os.getenv('LLM_CACHE_SIZE', '2048')),
+    ttl=float(os.getenv('LLM_CACHE_TTL', '3600')),
+    db_path=os.getenv('LLM_CACHE_DB') or None
+)
+
+SEMANTIC_CACHE_ENABLED = os.getenv('SEMANTIC_CACHE_ENABLED', 'true').lower() == 'true'
+semantic_cache = SemanticCache(
+    capacity=int(os.getenv('SEMANTIC_CACHE_SIZE', '512')),
+    threshold=float(os.getenv('SEMANTIC_CACHE_THRESHOLD', '0.9')),
+    ttl=llm_cache.ttl,
+    max_unmatched=int(os.getenv('SEMANTIC_CACHE_MAX_UNMATCHED', '1'))
+)
 
+# Opt-in: slow /api/chat requests get their spans and stack samples written to TRACE_DIR
+tracer = Tracer(
+    directory=os.getenv('TRACE_DIR', 'traces'),
+    slow_ms=float(os.getenv('TRACE_SLOW_MS', '500')),
+    sample_interval=float(os.getenv('TRACE_SAMPLE_INTERVAL_MS', '5')) / 1000,
+    max_traces=int(os.getenv('TRACE_MAX_FILES', '200')),
+    enabled=os.getenv('TRACING_ENABLED', 'false').lower() == 'true'
+)
+atexit.register(tracer.close)
+
+def stage(name):
+    """Time a pipeline stage for /metrics and record it as a span when tracing"""
+    def decorator(fn):
+        return STAGE_SECONDS.time(name)(traced(name)(fn))
+    return decorator
+
+
+@traced('db_connect')
 def get_db_connection():
-    """Create database connection"""
+    """Borrow a database connection from the pool (close() returns it)"""
     try:
-        connection = mysql.connector.connect(**DB_CONFIG)
+        connection = db_pool.get_connection()
         return connection
     except Error as e:
         print(f"Error connecting to MySQL: {e}")
+        DB_ERRORS.inc('connect')
         return None
 
+# Owner of the order the current chat turn looked up, for conversation_history
+turn_order_user_id = contextvars.ContextVar('turn_order_user_id', default=None)
+
+@stage('query_order')
 def query_order(order_id):
-    """Query order from database"""
+    """Query order from the snapshot or order cache, falling back to the database"""
+    order = lookup_order(order_id)
+    if order is not None:
+        turn_order_user_id.set(order.get('user_id'))
+    return order
+
+def lookup_order(order_id):
+    """One order from the snapshot, the order cache or the database"""
+    if ORDER_SNAPSHOT_ENABLED and order_snapshot.is_fresh():
+        order = order_snapshot.get(order_id)
+        if order is not None:
+            return order
+    
+    cached = order_cache.get(str(order_id))
+    if cached is not None:
+        return dict(cached)
+    
+    # Unknown order numbers are answered without touching the database
+    if ORDER_FILTER_ENABLED and not order_filter.might_exist(order_id):
+        return None
+    
+    # Concurrent lookups of the same order share one database query
+    order = order_flight.do(str(order_id), fetch_order, order_id)
+    return dict(order) if order is not None else None
+
+def fetch_order(order_id):
+    """Read one order from the database, caching it"""
     connection = get_db_connection()
     if not connection:
         return None
@@ -60,16 +183,108 @@ def query_order(order_id):
             WHERE o.order_id = %s
         """
         cursor.execute(query, (order_id,))
-        result = cursor.fetchone()
+        # Plain types (ISO dates, float amounts) from here on: cached, prompted and serialized as-is
+        result = plain_row(cursor.fetchone())
         cursor.close()
-        connection.close()
+        if result:
+            order_cache.set(str(order_id), dict(result))
+            order_filter.record_hit(order_id)
+        else:
+            order_filter.record_miss(order_id)
         return result
     except Error as e:
         print(f"Error querying order: {e}")
+        DB_ERRORS.inc('query_order')
         return None
+    finally:
+        connection.close()
+
+order_flight = SingleFlight('query_order', on_join=COALESCED_REQUESTS.inc)
+
+order_filter = OrderIdPrefilter(
+    lambda: get_db_connection(),
+    capacity=int(os.getenv('ORDER_FILTER_CAPACITY', '100000')),
+    refresh_interval=float(os.getenv('ORDER_FILTER_REFRESH', '1')),
+    negative_ttl=float(os.getenv('ORDER_NEGATIVE_CACHE_TTL', '30'))
+)
+
+# Optional: serve order lookups from an in-memory copy of orders JOIN users
+ORDER_SNAPSHOT_ENABLED = os.getenv('ORDER_SNAPSHOT_ENABLED', 'false').lower() == 'true'
+
+order_snapshot = OrderSnapshot(
+    lambda: get_db_connection(),
+    refresh_interval=float(os.getenv('ORDER_SNAPSHOT_REFRESH', '5')),
+    rebuild_interval=float(os.getenv('ORDER_SNAPSHOT_REBUILD', '300')),
+    max_staleness=float(os.getenv('ORDER_SNAPSHOT_MAX_STALENESS', '60')),
+    change_column=os.getenv('ORDER_SNAPSHOT_CHANGE_COLUMN', 'order_date'),
+    marker_tracks_updates=os.getenv('ORDER_SNAPSHOT_MARKER_TRACKS_UPDATES', 'false').lower() == 'true'
+)
+if ORDER_SNAPSHOT_ENABLED:
+    order_snapshot.start()
+    atexit.register(order_snapshot.close)
+
+BULK_ORDER_LIMIT = int(os.getenv('BULK_ORDER_LIMIT', '100'))
+
+@stage('query_orders')
+def query_orders(order_ids):
+    """Query several orders with one IN (...) query, returns {order_id: order} for the ones found
+
+    Snapshot and cached orders and numbers the prefilter rules out never reach the database.
+    """
+    found = {}
+    missing = []
+    use_snapshot = ORDER_SNAPSHOT_ENABLED and order_snapshot.is_fresh()
+    for order_id in dict.fromkeys(str(order_id) for order_id in order_ids):
+        order = order_snapshot.get(order_id) if use_snapshot else None
+        if order is not None:
+            found[order_id] = order
+            continue
+        cached = order_cache.get(order_id)
+        if cached is not None:
+            found[order_id] = dict(cached)
+        elif not ORDER_FILTER_ENABLED or order_filter.might_exist(order_id):
+            missing.append(order_id)
+    
+    if not missing:
+        return found
+    
+    connection = get_db_connection()
+    if not connection:
+        return found
+    
+    try:
+        cursor = connection.cursor(dictionary=True)
+        placeholders = ', '.join(['%s'] * len(missing))
+        query = f"""
+            SELECT o.*, u.name, u.email 
+            FROM orders o 
+            JOIN users u ON o.user_id = u.user_id 
+            WHERE o.order_id IN ({placeholders})
+        """
+        cursor.execute(query, missing)
+        results = [plain_row(row) for row in cursor.fetchall()]
+        cursor.close()
+        for result in results:
+            order_id = str(result['order_id'])
+            order_cache.set(order_id, dict(result))
+            order_filter.record_hit(order_id)
+            found[order_id] = result
+        for order_id in missing:
+            if order_id not in found:
+                order_filter.record_miss(order_id)
+        return found
+    except Error as e:
+        print(f"Error querying orders: {e}")
+        DB_ERRORS.inc('query_orders')
+        return found
+    finally:
+        connection.close()
 
 def query_user_orders(user_id):
     """Query all orders for a user"""
+    if ORDER_SNAPSHOT_ENABLED and order_snapshot.is_fresh():
+        return order_snapshot.user_orders(user_id)
+    
     connection = get_db_connection()
     if not connection:
         return []
@@ -78,16 +293,50 @@ def query_user_orders(user_id):
         cursor = connection.cursor(dictionary=True)
         query = "SELECT * FROM orders WHERE user_id = %s ORDER BY order_date DESC"
         cursor.execute(query, (user_id,))
-        results = cursor.fetchall()
+        results = [plain_row(row) for row in cursor.fetchall()]
         cursor.close()
-        connection.close()
         return results
     except Error as e:
         print(f"Error querying user orders: {e}")
+        DB_ERRORS.inc('query_user_orders')
         return []
+    finally:
+        connection.close()
+
+def invalidate_order(order_id):
+    """Drop an order from the cache so the next lookup reads it from the database"""
+    if order_id:
+        order_cache.invalidate(str(order_id))
 
-def create_ticket(user_id, issue_description):
-    """Create support ticket"""
+TICKET_QUEUE_ENABLED = os.getenv('TICKET_QUEUE_ENABLED', 'false').lower() == 'true'
+
+ticket_queue = TicketWriteQueue(
+    lambda: get_db_connection(),
+    batch_size=int(os.getenv('TICKET_QUEUE_BATCH_SIZE', '50')),
+    flush_interval=float(os.getenv('TICKET_QUEUE_FLUSH_INTERVAL', '0.05')),
+    max_pending=int(os.getenv('TICKET_QUEUE_MAX_PENDING', '1000')),
+    enqueue_timeout=float(os.getenv('TICKET_QUEUE_ENQUEUE_TIMEOUT', '1')),
+    result_timeout=float(os.getenv('TICKET_QUEUE_RESULT_TIMEOUT', '5'))
+)
+# Flush queued tickets before the process exits
+atexit.register(ticket_queue.close)
+
+# Set while replaying chat turns without side effects (see process_batch)
+replay_mode = contextvars.ContextVar('replay_mode', default=False)
+REPLAY_TICKET_ID = 'REPLAY'
+
+@stage('create_ticket')
+def create_ticket(user_id, issue_description, order_id=None):
+    """Create support ticket, invalidating the cached order it refers to"""
+    if replay_mode.get():
+        return REPLAY_TICKET_ID
+    
+    if TICKET_QUEUE_ENABLED:
+        ticket_id = ticket_queue.create(user_id, issue_description)
+        if ticket_id:
+            invalidate_order(order_id)
+        return ticket_id
+    
     connection = get_db_connection()
     if not connection:
         return None
@@ -102,143 +351,624 @@ def create_ticket(user_id, issue_description):
         connection.commit()
         ticket_id = cursor.lastrowid
         cursor.close()
-        connection.close()
+        invalidate_order(order_id)
         return ticket_id
     except Error as e:
         print(f"Error creating ticket: {e}")
+        DB_ERRORS.inc('create_ticket')
         return None
+    finally:
+        connection.close()
 
-def retrieve_from_knowledge_base(query):
-    """Retrieve relevant information from knowledge base"""
-    query_lower = query.lower()
-    relevant_info = []
-    
-    for key, value in KNOWLEDGE_BASE.items():
-        keywords = key.split('_')
-        if any(keyword in query_lower for keyword in keywords):
-            relevant_info.append(value)
-    
-    return relevant_info
+@stage('retrieve_from_knowledge_base')
+def retrieve_from_knowledge_base(query, top_k=None):
+    """Retrieve the most relevant knowledge base articles, best match first"""
+    results = kb_index.search(query, top_k=top_k or KB_TOP_K)
+    return [text for _key, text, _score in results]
 
 def extract_order_number(query):
     """Extract order number from query - looks for 5-digit numbers"""
-    # First check if the entire message is just a number (standalone order number)
-    query_stripped = query.strip()
-    if query_stripped.isdigit() and len(query_stripped) == 5:
-        return query_stripped
-    
-    # Otherwise look for 5-digit numbers in the text
-    match = re.search(r'\b\d{5}\b', query)
-    return match.group(0) if match else None
-
-def is_standalone_order_number(query):
-    """Check if message is just an order number"""
-    query_stripped = query.strip()
-    return query_stripped.isdigit() and len(query_stripped) == 5
+    _intent, numbers = classify_message(query, {})
+    return numbers[0] if numbers else None
 
 def detect_intent(query, context):
     """Detect user intent from query with context awareness"""
-    query_lower = query.lower().strip()
-    
-    # Check if it's a standalone order number
-    if is_standalone_order_number(query):
-        # Context determines what to do with the order number
-        if context.get('awaiting_return_order_number'):
-            return 'return_item_with_order'
-        elif context.get('awaiting_order_for_cancel'):
-            return 'cancel_order_with_number'
-        elif context.get('awaiting_order_for_address'):
-            return 'change_address_with_number'
+    intent, _numbers = classify_message(query, context)
+    return intent
+
+# Bounds what a slow or failing Gemini can cost: queue wait, call deadline, circuit breaker
+llm_guard = LLMGuard(
+    max_in_flight=int(os.getenv('LLM_MAX_IN_FLIGHT', '16')),
+    max_wait=float(os.getenv('LLM_QUEUE_TIMEOUT', '2')),
+    timeout=float(os.getenv('LLM_TIMEOUT', '20')),
+    breaker=CircuitBreaker(
+        error_threshold=float(os.getenv('LLM_BREAKER_ERROR_RATE', '0.5')),
+        window=float(os.getenv('LLM_BREAKER_WINDOW', '30')),
+        min_calls=int(os.getenv('LLM_BREAKER_MIN_CALLS', '10')),
+        cooldown=float(os.getenv('LLM_BREAKER_COOLDOWN', '15'))
+    ),
+    on_wait=LLM_QUEUE_SECONDS.observe,
+    on_trip=LLM_GUARD_TRIPS.inc
+)
+
+LLM_FALLBACK_MESSAGE = "I apologize, but I'm having trouble processing your request. Please try again or contact our support team at support@ecommerce.com"
+
+prompt_builder = PromptBuilder(
+    kb_token_budget=int(os.getenv('PROMPT_KB_TOKEN_BUDGET', '400')),
+    on_build=PROMPT_TOKENS.observe,
+    log_sizes=os.getenv('PROMPT_LOG_SIZES', 'false').lower() == 'true'
+)
+
+def build_prompt(query, db_info=None, kb_info=None):
+    """Build the Gemini prompt for a customer question (order data projected, KB text budgeted)"""
+    return prompt_builder.build(query, db_info, kb_info)
+
+def get_cached_response(query, db_info=None, kb_info=None):
+    """Exact-match then paraphrase cache lookup, None on a miss"""
+    cached = llm_cache.get(llm_cache.make_key(query, db_info, kb_info))
+    if cached is not None:
+        return cached
+    
+    if SEMANTIC_CACHE_ENABLED:
+        scope = semantic_cache.make_scope(query, payload_hash(db_info, kb_info))
+        similar, _similarity = semantic_cache.get(query, scope)
+        return similar
+    return None
+
+def cache_response(query, text, db_info=None, kb_info=None):
+    """Store a successfully generated answer in both caches"""
+    llm_cache.set(llm_cache.make_key(query, db_info, kb_info), text)
+    if SEMANTIC_CACHE_ENABLED:
+        semantic_cache.set(query, text, semantic_cache.make_scope(query, payload_hash(db_info, kb_info)))
+
+llm_flight = SingleFlight('gemini', on_join=COALESCED_REQUESTS.inc)
+
+def call_gemini(query, db_info=None, kb_info=None):
+    """Ask Gemini through the guard and cache the answer"""
+    response = llm_guard.call(model.generate_content, build_prompt(query, db_info, kb_info))
+    cache_response(query, response.text, db_info, kb_info)
+    return response.text
+
+@stage('generate_gemini_response')
+def generate_gemini_response(query, context, db_info=None, kb_info=None):
+    """Generate response using Gemini LLM, serving repeat questions from the cache"""
+    with span('llm_cache'):
+        cached = get_cached_response(query, db_info, kb_info)
+    if cached is not None:
+        return cached
+    
+    try:
+        # Identical questions asked at the same moment share one Gemini call
+        with span('gemini_call'):
+            return llm_flight.do(llm_cache.make_key(query, db_info, kb_info), call_gemini, query, db_info, kb_info)
+    except LLMUnavailable:
+        # Circuit open or no free slot: answer at once, counted in /metrics rather than printed
+        LLM_FALLBACKS.inc('generate')
+        return LLM_FALLBACK_MESSAGE
+    except Exception as e:
+        print(f"Error generating Gemini response: {e}")
+        LLM_FALLBACKS.inc('generate')
+        return LLM_FALLBACK_MESSAGE
+
+def stream_gemini_response(query, context, db_info=None, kb_info=None):
+    """Yield the Gemini answer in chunks as they are generated"""
+    cached = get_cached_response(query, db_info, kb_info)
+    if cached is not None:
+        yield cached
+        return
+    
+    chunks = []
+    start = time.perf_counter()
+    try:
+        for chunk in llm_guard.stream(model.generate_content, build_prompt(query, db_info, kb_info), stream=True):
+            if chunk.text:
+                chunks.append(chunk.text)
+                yield chunk.text
+    except LLMUnavailable:
+        LLM_FALLBACKS.inc('stream')
+        yield LLM_FALLBACK_MESSAGE
+        return
+    except Exception as e:
+        print(f"Error streaming Gemini response: {e}")
+        LLM_FALLBACKS.inc('stream')
+        if not chunks:
+            yield LLM_FALLBACK_MESSAGE
+        return
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, 'stream_gemini_response')
+    
+    cache_response(query, ''.join(chunks), db_info, kb_info)
+
+def format_order_status_message(order):
+    """Format order status message based on order data"""
+    status = order['status']
+    tracking = order.get('tracking_number', '')
+    if status == 'shipped' and tracking:
+        status = 'shipped_with_tracking'
+    return templates.render(
+        'track_order', status,
+        order_id=order['order_id'],
+        items=order.get('items', 'your order'),
+        delivery=order.get('estimated_delivery', '3 days' if order['status'] == 'shipped' else '5-7 days'),
+        tracking=tracking,
+        status=order['status']
+    )
+
+# ========== CONVERSATION HANDLERS ==========
+# Each handler fills in `response` for one flow. The same handler serves the
+# flow whether it was started by an intent ("cancel order 12346") or resumed
+# from an awaiting_* state ("12346" after "I want to cancel").
+
+def order_not_found(response, order_num):
+    """Standard reply for an order number that does not exist"""
+    response['message'] = templates.render('order_not_found', order_id=order_num)
+    response['type'] = 'error'
+
+def handle_track_order(message, order_num, response):
+    """Track an order, or ask for its number"""
+    context = response['context']
+    
+    if not order_num:
+        response['message'] = templates.render('track_order', 'ask_again' if context.get('awaiting_order_number') else 'ask')
+        response['type'] = 'clarification'
+        context['awaiting_order_number'] = True
+        return
+    
+    context.pop('awaiting_order_number', None)
+    order = query_order(order_num)
+    if not order:
+        order_not_found(response, order_num)
+        return
+    
+    response['message'] = format_order_status_message(order)
+    response['type'] = 'database_response'
+    response['order_info'] = order
+
+def handle_track_orders(message, order_nums, response):
+    """Track several orders mentioned in one message ("where are 12345 and 12348?")"""
+    response['context'].pop('awaiting_order_number', None)
+    order_ids = list(dict.fromkeys(order_nums))
+    orders = query_orders(order_ids)
+    owners = {order.get('user_id') for order in orders.values()}
+    if len(owners) == 1:
+        turn_order_user_id.set(owners.pop())
+    
+    lines = []
+    for order_id in order_ids:
+        if order_id in orders:
+            lines.append(format_order_status_message(orders[order_id]))
         else:
-            # Default: treat as tracking request
-            return 'track_order'
+            lines.append(templates.render('track_orders', 'not_found', order_id=order_id))
     
-    # Has order number in query
-    has_order_number = extract_order_number(query) is not None
+    response['message'] = '\n'.join(lines)
+    response['type'] = 'database_response' if orders else 'error'
+    response['orders_info'] = [orders[order_id] for order_id in order_ids if order_id in orders]
+
+def handle_return(message, order_num, response):
+    """Start a return for an order, or ask for its number"""
+    context = response['context']
+    
+    if not order_num:
+        response['message'] = templates.render('return_item', 'ask_again' if context.get('awaiting_return_order_number') else 'ask')
+        response['type'] = 'clarification'
+        context['awaiting_return_order_number'] = True
+        return
+    
+    context.pop('awaiting_return_order_number', None)
+    order = query_order(order_num)
+    if not order:
+        order_not_found(response, order_num)
+        return
     
-    # Return/Refund intent
-    if any(word in query_lower for word in ['return', 'refund', 'send back']):
-        if has_order_number:
-            return 'return_item_with_order'
-        return 'return_item'
+    response['type'] = 'database_response'
+    response['message'] = templates.render('return_item', order['status'], order_id=order_num, items=order['items'])
+    if order['status'] == 'delivered':
+        response['order_info'] = order
+    elif order['status'] not in ('shipped', 'cancelled'):
+        context['awaiting_cancel_confirmation'] = True
+        context['pending_order_number'] = order_num
+
+def submit_cancellation(order_num, order, response):
+    """Create the cancellation ticket for a processing order"""
+    issue_desc = f"Cancel order request: Order #{order_num} - {order['items']}"
+    ticket_id = create_ticket(order['user_id'], issue_desc, order_num)
     
-    # Order tracking
-    if any(word in query_lower for word in ['track', 'status', 'where is', 'where\'s', 'delivery', 'order']):
-        if 'return' not in query_lower and 'refund' not in query_lower and 'cancel' not in query_lower:
-            return 'track_order'
+    if ticket_id == TICKET_PENDING:
+        response['message'] = templates.render('cancel_order', 'ticket_pending', order_id=order_num, items=order['items'])
+        response['type'] = 'escalation_confirmed'
+    elif ticket_id:
+        response['message'] = templates.render('cancel_order', 'ticket_created', order_id=order_num, items=order['items'], ticket_id=ticket_id)
+        response['type'] = 'escalation_confirmed'
+        response['ticket_id'] = ticket_id
+    else:
+        response['message'] = templates.render('cancel_order', 'ticket_failed')
+        response['type'] = 'error'
+
+def handle_cancel_order(message, order_num, response):
+    """Cancel an order, or ask for its number"""
+    context = response['context']
     
-    # Shipping
-    if any(word in query_lower for word in ['shipping', 'ship', 'delivery options', 'how long']):
-        if 'track' not in query_lower and 'where' not in query_lower and not has_order_number:
-            return 'shipping_info'
+    if not order_num:
+        response['message'] = templates.render('cancel_order', 'ask_again' if context.get('awaiting_order_for_cancel') else 'ask')
+        response['type'] = 'clarification'
+        context['awaiting_order_for_cancel'] = True
+        return
     
-    # Payment
-    if any(word in query_lower for word in ['payment', 'pay', 'card', 'upi', 'paytm']):
-        return 'payment_info'
+    context.pop('awaiting_order_for_cancel', None)
+    order = query_order(order_num)
+    if not order:
+        order_not_found(response, order_num)
+        return
     
-    # Cancel
-    if any(word in query_lower for word in ['cancel', 'stop order']):
-        return 'cancel_order'
+    if order['status'] == 'processing':
+        submit_cancellation(order_num, order, response)
+    else:
+        response['message'] = templates.render('cancel_order', order['status'], order_id=order_num, items=order['items'], status=order['status'])
+        response['type'] = 'database_response'
+
+def handle_change_address(message, order_num, response):
+    """Offer an address-change ticket for an order, or ask for its number"""
+    context = response['context']
     
-    # Address change
-    if 'address' in query_lower and ('change' in query_lower or 'update' in query_lower or 'modify' in query_lower):
-        return 'change_address'
+    if not order_num:
+        response['message'] = templates.render('change_address', 'ask_again' if context.get('awaiting_order_for_address') else 'ask')
+        response['type'] = 'clarification'
+        context['awaiting_order_for_address'] = True
+        return
     
-    # Contact/Support
-    if any(word in query_lower for word in ['contact', 'support', 'help', 'speak to', 'talk to', 'agent']):
-        return 'contact_support'
+    context.pop('awaiting_order_for_address', None)
+    order = query_order(order_num)
+    if not order:
+        order_not_found(response, order_num)
+        return
     
-    return 'general'
+    response['message'] = templates.render('change_address', order['status'], order_id=order_num, items=order['items'], status=order['status'])
+    if order['status'] == 'processing':
+        response['type'] = 'escalation'
+        response['needs_escalation'] = True
+        context['awaiting_address_change_confirmation'] = True
+        context['pending_order_number'] = order_num
+    else:
+        response['type'] = 'database_response'
 
-def generate_gemini_response(query, context, db_info=None, kb_info=None):
-    """Generate response using Gemini LLM"""
+def handle_cancel_confirmation(message, order_num, response):
+    """Answer to "Would you like to cancel?" after a return request"""
+    context = response['context']
+    order_num = context.pop('pending_order_number', None)
+    context.pop('awaiting_cancel_confirmation', None)
+    
+    if not contains_any(message.lower(), CANCEL_CONFIRM_WORDS):
+        response['message'] = templates.render('cancel_order', 'declined')
+        response['type'] = 'general'
+        return
     
-    prompt = f"""You are a helpful e-commerce customer support assistant. 
+    order = query_order(order_num) if order_num else None
+    if not order:
+        order_not_found(response, order_num)
+        return
     
-User Query: {query}
+    submit_cancellation(order_num, order, response)
 
-"""
+def handle_address_change_confirmation(message, order_num, response):
+    """Answer to "Would you like me to create a ticket?" for an address change"""
+    context = response['context']
+    order_num = context.pop('pending_order_number', None)
+    context.pop('awaiting_address_change_confirmation', None)
+    
+    if not contains_any(message.lower(), ADDRESS_CONFIRM_WORDS):
+        response['message'] = templates.render('change_address', 'declined')
+        response['type'] = 'general'
+        return
     
-    if db_info:
-        prompt += f"\nDatabase Information: {json.dumps(db_info, default=str)}\n"
+    order = query_order(order_num) if order_num else None
+    user_id = order['user_id'] if order else 1
+    issue_desc = f"Address change request for order #{order_num}"
     
+    ticket_id = create_ticket(user_id, issue_desc, order_num)
+    if ticket_id == TICKET_PENDING:
+        response['message'] = templates.render('change_address', 'ticket_pending')
+        response['type'] = 'escalation_confirmed'
+    elif ticket_id:
+        response['message'] = templates.render('change_address', 'ticket_created', ticket_id=ticket_id)
+        response['type'] = 'escalation_confirmed'
+        response['ticket_id'] = ticket_id
+    else:
+        response['message'] = templates.render('change_address', 'ticket_failed')
+        response['type'] = 'error'
+
+def handle_shipping_info(message, order_num, response):
+    """Shipping options from the knowledge base"""
+    kb_info = retrieve_from_knowledge_base('shipping')
+    response['message'] = kb_info[0] if kb_info else kb_index.get('shipping_options')
+    response['type'] = 'knowledge_base_response'
+
+def handle_payment_info(message, order_num, response):
+    """Payment methods from the knowledge base"""
+    kb_info = retrieve_from_knowledge_base('payment')
+    response['message'] = kb_info[0] if kb_info else kb_index.get('payment_methods')
+    response['type'] = 'knowledge_base_response'
+
+def handle_contact_support(message, order_num, response):
+    """Support contact details"""
+    response['message'] = kb_index.get('customer_support')
+    response['type'] = 'knowledge_base_response'
+
+def handle_general(message, order_num, response):
+    """Knowledge base answer, falling back to Gemini"""
+    prepare_general(message, order_num, response)
+    if response['message'] is None:
+        response['message'] = generate_gemini_response(message, response['context'])
+
+def prepare_general(message, order_num, response):
+    """Knowledge base answer, or a generated_response with message None for the caller to generate"""
+    kb_info = retrieve_from_knowledge_base(message)
     if kb_info:
-        prompt += f"\nKnowledge Base Information: {' '.join(kb_info)}\n"
+        response['message'] = ' '.join(kb_info)
+        response['type'] = 'knowledge_base_response'
+    else:
+        response['message'] = None
+        response['type'] = 'generated_response'
+
+# Pending conversation states, checked in priority order before intent detection
+STATE_HANDLERS = {
+    'awaiting_order_number': handle_track_order,
+    'awaiting_return_order_number': handle_return,
+    'awaiting_order_for_cancel': handle_cancel_order,
+    'awaiting_order_for_address': handle_change_address,
+    'awaiting_address_change_confirmation': handle_address_change_confirmation,
+    'awaiting_cancel_confirmation': handle_cancel_confirmation
+}
+
+INTENT_HANDLERS = {
+    'track_order': handle_track_order,
+    'return_item': handle_return,
+    'return_item_with_order': handle_return,
+    'cancel_order': handle_cancel_order,
+    'cancel_order_with_number': handle_cancel_order,
+    'change_address': handle_change_address,
+    'change_address_with_number': handle_change_address,
+    'shipping_info': handle_shipping_info,
+    'payment_info': handle_payment_info,
+    'contact_support': handle_contact_support,
+    'general': handle_general
+}
+
+# Handlers that can act on every order number in a message, not just the first
+MULTI_ORDER_HANDLERS = {
+    handle_track_order: handle_track_orders
+}
+
+handler_timings = {}
+handler_timings_lock = threading.Lock()
+
+def record_handler_timing(name, elapsed):
+    """Accumulate per-handler call counts and latency"""
+    with handler_timings_lock:
+        entry = handler_timings.get(name)
+        if entry is None:
+            entry = handler_timings[name] = {'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0}
+        elapsed_ms = elapsed * 1000
+        entry['calls'] += 1
+        entry['total_ms'] += elapsed_ms
+        entry['max_ms'] = max(entry['max_ms'], elapsed_ms)
+
+def handler_timing_stats():
+    """Per-handler call counts with average and max latency"""
+    with handler_timings_lock:
+        return {
+            name: {
+                'calls': entry['calls'],
+                'avg_ms': round(entry['total_ms'] / entry['calls'], 3),
+                'max_ms': round(entry['max_ms'], 3)
+            }
+            for name, entry in handler_timings.items()
+        }
+
+CONVERSATION_LOG_ENABLED = os.getenv('CONVERSATION_LOG_ENABLED', 'true').lower() == 'true'
+
+conversation_log = ConversationLogger(
+    lambda: get_db_connection(),
+    capacity=int(os.getenv('CONVERSATION_LOG_CAPACITY', '10000')),
+    batch_size=int(os.getenv('CONVERSATION_LOG_BATCH_SIZE', '200')),
+    flush_interval=float(os.getenv('CONVERSATION_LOG_FLUSH_INTERVAL', '1')),
+    overflow=os.getenv('CONVERSATION_LOG_OVERFLOW', 'drop'),
+    spill_path=os.getenv('CONVERSATION_LOG_SPILL_FILE', 'conversation_spill.jsonl')
+)
+atexit.register(conversation_log.close)
+
+def log_user_id(value):
+    """A client-supplied user_id as a positive int, None (logged as NULL) for anything else"""
+    if isinstance(value, bool):
+        return None
+    try:
+        user_id = int(value)
+    except (TypeError, ValueError):
+        return None
+    return user_id if user_id > 0 else None
+
+def log_conversation(user_message, intent, response_data, user_id=None, state=None):
+    """Queue a finished chat turn for conversation_history"""
+    if CONVERSATION_LOG_ENABLED and not replay_mode.get():
+        conversation_log.log(log_user_id(user_id), user_message, response_data['message'], intent,
+                             response_data['type'], state)
+
+def process_message(user_message, conversation_context, generate=True, user_id=None):
+    """Run one chat turn and return the response dict
+
+    With generate=False a turn that needs Gemini comes back as a
+    generated_response whose message is None, so the caller can stream or
+    await the generation itself (and then log the turn with intent 'general').
+    """
+    response_data = {
+        'message': '',
+        'type': 'general',
+        'needs_escalation': False,
+        'context': conversation_context.copy()
+    }
+    
+    # Classify intent and extract the order number in a single pass
+    turn_start = time.perf_counter()
+    intent, order_numbers = classify_message(user_message, conversation_context)
+    intent_time = time.perf_counter() - turn_start
+    STAGE_SECONDS.observe(intent_time, 'detect_intent')
+    add_span('detect_intent', turn_start, intent_time)
+    order_num = order_numbers[0] if order_numbers else None
     
-    prompt += """
-Please provide a helpful, concise, and friendly response. If you're providing order information, be specific.
-If you need more information from the user, ask clearly. Keep responses under 3 sentences unless providing detailed information.
-"""
+    # A pending conversation state wins over whatever the new message looks like
+    state = next((name for name in STATE_HANDLERS if conversation_context.get(name)), None)
+    handler = STATE_HANDLERS[state] if state else INTENT_HANDLERS.get(intent, handle_general)
+    order_arg = order_num
+    if handler is handle_general and not generate:
+        handler = prepare_general
+    elif handler in MULTI_ORDER_HANDLERS and len(set(order_numbers)) > 1:
+        handler = MULTI_ORDER_HANDLERS[handler]
+        order_arg = order_numbers
     
+    start = time.perf_counter()
+    token = turn_order_user_id.set(None)
     try:
-        response = model.generate_content(prompt)
-        return response.text
-    except Exception as e:
-        print(f"Error generating Gemini response: {e}")
-        return "I apologize, but I'm having trouble processing your request. Please try again or contact our support team at support@ecommerce.com"
+        handler(user_message, order_arg, response_data)
+        order_user_id = turn_order_user_id.get()
+    finally:
+        turn_order_user_id.reset(token)
+    end = time.perf_counter()
+    record_handler_timing(handler.__name__, end - start)
+    add_span(handler.__name__, start, end - start)
+    TURN_SECONDS.observe(end - turn_start, intent, state or 'none', response_data['type'])
+    
+    if response_data['message'] is not None:
+        if log_user_id(user_id) is None:
+            user_id = order_user_id
+        log_conversation(user_message, intent, response_data, user_id, state)
+    
+    return response_data
 
-def format_order_status_message(order):
-    """Format order status message based on order data"""
-    status = order['status']
-    order_id = order['order_id']
-    items = order.get('items', 'your order')
-    
-    if status == 'shipped':
-        delivery = order.get('estimated_delivery', '3 days')
-        tracking = order.get('tracking_number', '')
-        msg = f"Your order #{order_id} ({items}) is on its way and should arrive within {delivery}."
-        if tracking:
-            msg += f" Tracking number: {tracking}"
-        return msg
-    elif status == 'processing':
-        delivery = order.get('estimated_delivery', '5-7 days')
-        return f"Your order #{order_id} ({items}) is currently being processed and will ship soon. Expected delivery: {delivery}."
-    elif status == 'delivered':
-        return f"Your order #{order_id} ({items}) has been delivered. If you have any issues, please let me know!"
-    elif status == 'cancelled':
-        return f"Order #{order_id} ({items}) has been cancelled. If you need assistance, please contact our support team."
+BATCH_CHUNK_SIZE = int(os.getenv('BATCH_CHUNK_SIZE', '500'))
+batch_llm_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('BATCH_LLM_CONCURRENCY', '8')),
+    thread_name_prefix='batch-llm'
+)
+
+def parse_batch_record(line):
+    """Return (record, error) for one JSONL line; the record's message comes back stripped"""
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return None, 'Invalid JSON'
+    if not isinstance(record, dict):
+        return None, 'No message provided'
+    message = record.get('message')
+    if message is not None and not isinstance(message, str):
+        return None, 'message must be a string'
+    record['message'] = (message or '').strip()
+    if not record['message']:
+        return None, 'No message provided'
+    if not isinstance(record.get('context') or {}, dict):
+        return None, 'context must be an object'
+    return record, None
+
+def process_batch_chunk(chunk, replay):
+    """Process (line number, line) pairs, returns their results in order"""
+    token = replay_mode.set(replay)
+    try:
+        records = [(line_no,) + parse_batch_record(line) for line_no, line in chunk]
+        
+        # Group the database lookups: one IN (...) query warms the order cache for the whole chunk
+        order_ids = set()
+        for _line_no, record, _error in records:
+            if record:
+                order_ids.update(classify_message(record['message'], record.get('context') or {})[1])
+        if order_ids:
+            query_orders(order_ids)
+        
+        pending = []
+        for line_no, record, error in records:
+            if error:
+                pending.append(({'line': line_no, 'error': error}, None, None))
+                continue
+            
+            message = record['message']
+            result = {'line': line_no}
+            if 'id' in record:
+                result['id'] = record['id']
+            result.update(process_message(message, record.get('context') or {}, generate=False,
+                                          user_id=record.get('user_id')))
+            future = None
+            if result['message'] is None:
+                future = batch_llm_executor.submit(generate_gemini_response, message, result['context'])
+            pending.append((result, future, record))
+        
+        results = []
+        for result, future, record in pending:
+            if future is not None:
+                result['message'] = future.result()
+                log_conversation(record['message'], 'general', result, record.get('user_id'))
+            results.append(result)
+        return results
+    finally:
+        replay_mode.reset(token)
+
+def process_batch(lines, replay=True):
+    """Run JSONL chat records ({"message", "context"}) through the chat pipeline
+
+    Yields one result per non-blank line, in input order, tagged with its
+    1-based line number (and the record's `id` if it has one). Records are
+    processed BATCH_CHUNK_SIZE at a time: order numbers are fetched with one
+    query per chunk and Gemini calls run BATCH_LLM_CONCURRENCY at a time. With
+    replay=True no tickets are created and nothing is logged.
+    """
+    chunk = []
+    for line_no, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        chunk.append((line_no, line))
+        if len(chunk) >= BATCH_CHUNK_SIZE:
+            yield from process_batch_chunk(chunk, replay)
+            chunk = []
+    if chunk:
+        yield from process_batch_chunk(chunk, replay)
+
+SESSION_BACKEND = os.getenv('SESSION_BACKEND', 'memory').lower()
+SESSION_TTL = int(os.getenv('SESSION_TTL', '1800'))
+
+if SESSION_BACKEND == 'mysql':
+    session_backend = MySQLSessionBackend(lambda: get_db_connection(), ttl=SESSION_TTL)
+else:
+    session_backend = MemorySessionBackend(max_size=int(os.getenv('SESSION_CACHE_SIZE', '10000')), ttl=SESSION_TTL)
+session_store = SessionStore(session_backend)
+
+def chat_turn(user_message, data, generate=True):
+    """Run one chat turn for a request body, returns (session_id, response_data)
+
+    Clients that send a `context` dict and no `session_id` (older frontends)
+    keep round-tripping the context and get session_id None. Everyone else
+    gets a server-side session whose context is saved after the turn.
+    """
+    if 'context' in data and not data.get('session_id'):
+        session_id, conversation_context = None, data.get('context') or {}
     else:
-        return f"Your order #{order_id} status: {status}."
+        with span('session_load'):
+            session_id, conversation_context = session_store.load(data.get('session_id'))
+    
+    response_data = process_message(user_message, conversation_context, generate=generate, user_id=data.get('user_id'))
+    if session_id is not None:
+        with span('session_save'):
+            session_store.save(session_id, response_data['context'])
+    return session_id, response_data
+
+def client_response(session_id, response_data):
+    """Session clients get their session_id back instead of the context dict"""
+    if session_id is None:
+        return response_data
+    payload = {key: value for key, value in response_data.items() if key != 'context'}
+    payload['session_id'] = session_id
+    return payload
+
+def cached_chat_body(payload):
+    """Pre-serialized JSON body for a static chat reply, None for anything else"""
+    if payload.get('type') not in CACHEABLE_REPLY_TYPES:
+        return None
+    return response_bodies.get(payload)
 
 # API Routes
 @app.route('/')
@@ -251,337 +981,102 @@ def chat():
     """Main chat endpoint with enhanced conversational behavior"""
     data = request.json
     user_message = data.get('message', '').strip()
-    conversation_context = data.get('context', {})
     
     if not user_message:
         return jsonify({'error': 'No message provided'}), 400
     
-    # Initialize response data
-    response_data = {
-        'message': '',
-        'type': 'general',
-        'needs_escalation': False,
-        'context': conversation_context.copy()
-    }
+    with tracer.request(request.headers.get('X-Trace-Id'), name='/api/chat') as trace:
+        session_id, response_data = chat_turn(user_message, data)
+    payload = client_response(session_id, response_data)
+    body = cached_chat_body(payload)
+    response = Response(body, mimetype='application/json') if body is not None else jsonify(payload)
+    if trace is not None:
+        response.headers['X-Trace-Id'] = trace.trace_id
+    return response
+
+def sse_event(event, data):
+    """Format one Server-Sent Event with a JSON payload"""
+    return f"event: {event}\ndata: {app.json.dumps(data)}\n\n"
+
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """Streaming chat endpoint: database and knowledge base answers are sent at once,
+    Gemini answers are streamed token by token as Server-Sent Events"""
+    data = request.json
+    user_message = data.get('message', '').strip()
     
-    # Extract order number once for reuse
-    order_num = extract_order_number(user_message)
-    
-    # ========== CONTEXT-AWARE STATE HANDLING ==========
-    
-    # State: Awaiting order number for tracking
-    if conversation_context.get('awaiting_order_number'):
-        if order_num:
-            order = query_order(order_num)
-            if order:
-                response_data['message'] = format_order_status_message(order)
-                response_data['type'] = 'database_response'
-                response_data['order_info'] = order
-                response_data['context'].pop('awaiting_order_number', None)
-            else:
-                response_data['message'] = f"I couldn't find order #{order_num} in our system. Please double-check the order number. Valid orders in our system are: 12345, 12346, 12347, 12348, 12349, 12350."
-                response_data['type'] = 'error'
-                response_data['context'].pop('awaiting_order_number', None)
-        else:
-            response_data['message'] = "I need a valid 5-digit order number to track your order. Could you please provide it?"
-            response_data['type'] = 'clarification'
-        
-        return jsonify(response_data)
-    
-    # State: Awaiting order number for return
-    if conversation_context.get('awaiting_return_order_number'):
-        if order_num:
-            order = query_order(order_num)
-            if order:
-                if order['status'] == 'delivered':
-                    response_data['message'] = f"I found your order #{order_num} ({order['items']}). You can return it within 30 days. Visit our Returns page: https://ecommerce.com/returns. Need help with the process?"
-                    response_data['type'] = 'database_response'
-                    response_data['order_info'] = order
-                elif order['status'] == 'shipped':
-                    response_data['message'] = f"Your order #{order_num} ({order['items']}) is currently in transit. Once delivered, you can return it within 30 days. Visit: https://ecommerce.com/returns"
-                    response_data['type'] = 'database_response'
-                elif order['status'] == 'cancelled':
-                    response_data['message'] = f"Order #{order_num} has already been cancelled. No return is needed."
-                    response_data['type'] = 'database_response'
-                else:
-                    response_data['message'] = f"Order #{order_num} ({order['items']}) is still being processed. You can cancel it instead of returning. Would you like to cancel?"
-                    response_data['type'] = 'database_response'
-                    response_data['context']['awaiting_cancel_confirmation'] = True
-                    response_data['context']['pending_order_number'] = order_num
-                
-                response_data['context'].pop('awaiting_return_order_number', None)
-            else:
-                response_data['message'] = f"I couldn't find order #{order_num} in our system. Please verify the order number. You can find it in your order confirmation email."
-                response_data['type'] = 'error'
-                response_data['context'].pop('awaiting_return_order_number', None)
-        else:
-            response_data['message'] = "Please provide your 5-digit order number so I can help you with the return."
-            response_data['type'] = 'clarification'
-        
-        return jsonify(response_data)
-    
-    # State: Awaiting order number for cancellation
-    if conversation_context.get('awaiting_order_for_cancel'):
-        if order_num:
-            order = query_order(order_num)
-            if order:
-                if order['status'] == 'processing':
-                    user_id = order['user_id']
-                    issue_desc = f"Cancel order request: Order #{order_num} - {order['items']}"
-                    ticket_id = create_ticket(user_id, issue_desc)
-                    
-                    if ticket_id:
-                        response_data['message'] = f"I've created a cancellation request for order #{order_num} ({order['items']}). Our team will process it within 24 hours. Your ticket number is #{ticket_id}."
-                        response_data['type'] = 'escalation_confirmed'
-                        response_data['ticket_id'] = ticket_id
-                    else:
-                        response_data['message'] = "I'm sorry, I couldn't create the cancellation request. Please contact support@ecommerce.com or call 1800-000-0000."
-                        response_data['type'] = 'error'
-                elif order['status'] == 'shipped':
-                    response_data['message'] = f"Order #{order_num} ({order['items']}) has already shipped. You'll need to refuse the delivery or initiate a return once received."
-                    response_data['type'] = 'database_response'
-                elif order['status'] == 'cancelled':
-                    response_data['message'] = f"Order #{order_num} is already cancelled."
-                    response_data['type'] = 'database_response'
-                else:
-                    response_data['message'] = f"Order #{order_num} status is '{order['status']}'. Please contact support for assistance."
-                    response_data['type'] = 'database_response'
-                
-                response_data['context'].pop('awaiting_order_for_cancel', None)
-            else:
-                response_data['message'] = f"I couldn't find order #{order_num}. Please verify the order number."
-                response_data['type'] = 'error'
-                response_data['context'].pop('awaiting_order_for_cancel', None)
-        else:
-            response_data['message'] = "Please provide your 5-digit order number to cancel."
-            response_data['type'] = 'clarification'
-        
-        return jsonify(response_data)
-    
-    # State: Awaiting order number for address change
-    if conversation_context.get('awaiting_order_for_address'):
-        if order_num:
-            order = query_order(order_num)
-            if order:
-                if order['status'] == 'processing':
-                    response_data['message'] = f"I found order #{order_num} ({order['items']}). I'll forward your address change request to our support team. Would you like me to create a ticket?"
-                    response_data['type'] = 'escalation'
-                    response_data['needs_escalation'] = True
-                    response_data['context']['awaiting_address_change_confirmation'] = True
-                    response_data['context']['pending_order_number'] = order_num
-                    response_data['context'].pop('awaiting_order_for_address', None)
-                elif order['status'] == 'shipped':
-                    response_data['message'] = f"Order #{order_num} ({order['items']}) has already shipped. The address cannot be changed now. You may need to contact the carrier or wait for delivery."
-                    response_data['type'] = 'database_response'
-                    response_data['context'].pop('awaiting_order_for_address', None)
-                else:
-                    response_data['message'] = f"Order #{order_num} status is '{order['status']}'. Address changes may not be possible."
-                    response_data['type'] = 'database_response'
-                    response_data['context'].pop('awaiting_order_for_address', None)
-            else:
-                response_data['message'] = f"I couldn't find order #{order_num}. Please verify the order number."
-                response_data['type'] = 'error'
-                response_data['context'].pop('awaiting_order_for_address', None)
-        else:
-            response_data['message'] = "Please provide your 5-digit order number to update the address."
-            response_data['type'] = 'clarification'
-        
-        return jsonify(response_data)
+    if not user_message:
+        return jsonify({'error': 'No message provided'}), 400
     
-    # State: Awaiting address change confirmation
-    if conversation_context.get('awaiting_address_change_confirmation'):
-        order_num = conversation_context.get('pending_order_number')
-        user_response_lower = user_message.lower()
-        
-        if any(word in user_response_lower for word in ['yes', 'sure', 'please', 'ok', 'yeah', 'yep', 'confirm']):
-            order = query_order(order_num) if order_num else None
-            user_id = order['user_id'] if order else 1
-            issue_desc = f"Address change request for order #{order_num}"
-            
-            ticket_id = create_ticket(user_id, issue_desc)
-            if ticket_id:
-                response_data['message'] = f"I've created ticket #{ticket_id} for your address change request. Our support team will contact you shortly to update the delivery address."
-                response_data['type'] = 'escalation_confirmed'
-                response_data['ticket_id'] = ticket_id
-            else:
-                response_data['message'] = "I'm sorry, I couldn't create the ticket. Please contact support@ecommerce.com directly."
-                response_data['type'] = 'error'
-        else:
-            response_data['message'] = "No problem! Is there anything else I can help you with?"
-            response_data['type'] = 'general'
-        
-        response_data['context'].pop('awaiting_address_change_confirmation', None)
-        response_data['context'].pop('pending_order_number', None)
-        return jsonify(response_data)
-    
-    # State: Awaiting cancel confirmation
-    if conversation_context.get('awaiting_cancel_confirmation'):
-        order_num = conversation_context.get('pending_order_number')
-        user_response_lower = user_message.lower()
-        
-        if any(word in user_response_lower for word in ['yes', 'sure', 'please', 'ok', 'yeah', 'yep', 'cancel']):
-            order = query_order(order_num) if order_num else None
-            if order:
-                user_id = order['user_id']
-                issue_desc = f"Cancel order request: Order #{order_num} - {order['items']}"
-                ticket_id = create_ticket(user_id, issue_desc)
-                
-                if ticket_id:
-                    response_data['message'] = f"I've created a cancellation request for order #{order_num}. Our team will process it within 24 hours. Ticket #{ticket_id}."
-                    response_data['type'] = 'escalation_confirmed'
-                    response_data['ticket_id'] = ticket_id
-                else:
-                    response_data['message'] = "I'm sorry, I couldn't create the request. Please contact support@ecommerce.com"
-                    response_data['type'] = 'error'
-        else:
-            response_data['message'] = "Okay, I won't cancel the order. Let me know if you need anything else!"
-            response_data['type'] = 'general'
+    session_id, response_data = chat_turn(user_message, data, generate=False)
+    
+    def events():
+        if response_data['message'] is not None:
+            yield sse_event('done', client_response(session_id, response_data))
+            return
         
-        response_data['context'].pop('awaiting_cancel_confirmation', None)
-        response_data['context'].pop('pending_order_number', None)
-        return jsonify(response_data)
-    
-    # ========== NEW QUERY - INTENT DETECTION ==========
-    intent = detect_intent(user_message, conversation_context)
-    
-    # Handle: Track Order
-    if intent == 'track_order':
-        if order_num:
-            order = query_order(order_num)
-            if order:
-                response_data['message'] = format_order_status_message(order)
-                response_data['type'] = 'database_response'
-                response_data['order_info'] = order
-            else:
-                response_data['message'] = f"I couldn't find order #{order_num} in our system. Please double-check the order number or contact support at support@ecommerce.com"
-                response_data['type'] = 'error'
-        else:
-            response_data['message'] = "I can help track your order! Please provide your 5-digit order number."
-            response_data['type'] = 'clarification'
-            response_data['context']['awaiting_order_number'] = True
-    
-    # Handle: Return with Order Number
-    elif intent == 'return_item_with_order':
-        if order_num:
-            order = query_order(order_num)
-            if order:
-                if order['status'] == 'delivered':
-                    response_data['message'] = f"I found your order #{order_num} ({order['items']}). You can return it within 30 days. Visit our Returns page: https://ecommerce.com/returns. Need help?"
-                    response_data['type'] = 'database_response'
-                    response_data['order_info'] = order
-                elif order['status'] == 'shipped':
-                    response_data['message'] = f"Your order #{order_num} ({order['items']}) is in transit. Once delivered, you can return it within 30 days. Visit: https://ecommerce.com/returns"
-                    response_data['type'] = 'database_response'
-                elif order['status'] == 'cancelled':
-                    response_data['message'] = f"Order #{order_num} has already been cancelled. No return needed."
-                    response_data['type'] = 'database_response'
-                else:
-                    response_data['message'] = f"Order #{order_num} ({order['items']}) is still processing. You can cancel it instead. Would you like to cancel?"
-                    response_data['type'] = 'database_response'
-                    response_data['context']['awaiting_cancel_confirmation'] = True
-                    response_data['context']['pending_order_number'] = order_num
-            else:
-                response_data['message'] = f"I couldn't find order #{order_num}. Please verify the order number."
-                response_data['type'] = 'error'
-        else:
-            response_data['message'] = "I can help you with a return! Please provide your order number."
-            response_data['type'] = 'clarification'
-            response_data['context']['awaiting_return_order_number'] = True
-    
-    # Handle: Return without Order Number
-    elif intent == 'return_item':
-        response_data['message'] = "I can help with your return! Please provide your 5-digit order number."
-        response_data['type'] = 'clarification'
-        response_data['context']['awaiting_return_order_number'] = True
-    
-    # Handle: Change Address
-    elif intent == 'change_address' or intent == 'change_address_with_number':
-        if order_num:
-            order = query_order(order_num)
-            if order:
-                if order['status'] == 'processing':
-                    response_data['message'] = f"I found order #{order_num} ({order['items']}). I'll forward your address change request to our support team. Would you like me to create a ticket?"
-                    response_data['type'] = 'escalation'
-                    response_data['needs_escalation'] = True
-                    response_data['context']['awaiting_address_change_confirmation'] = True
-                    response_data['context']['pending_order_number'] = order_num
-                elif order['status'] == 'shipped':
-                    response_data['message'] = f"Order #{order_num} ({order['items']}) has already shipped. The address cannot be changed. Contact the carrier or wait for delivery."
-                    response_data['type'] = 'database_response'
-                else:
-                    response_data['message'] = f"Order #{order_num} status is '{order['status']}'. Address changes may not be possible."
-                    response_data['type'] = 'database_response'
-            else:
-                response_data['message'] = f"I couldn't find order #{order_num}. Please verify the order number."
-                response_data['type'] = 'error'
-        else:
-            response_data['message'] = "I can help update the delivery address! Please provide your order number."
-            response_data['type'] = 'clarification'
-            response_data['context']['awaiting_order_for_address'] = True
-    
-    # Handle: Shipping Info
-    elif intent == 'shipping_info':
-        kb_info = retrieve_from_knowledge_base('shipping')
-        response_data['message'] = kb_info[0] if kb_info else KNOWLEDGE_BASE['shipping_options']
-        response_data['type'] = 'knowledge_base_response'
-    
-    # Handle: Payment Info
-    elif intent == 'payment_info':
-        kb_info = retrieve_from_knowledge_base('payment')
-        response_data['message'] = kb_info[0] if kb_info else KNOWLEDGE_BASE['payment_methods']
-        response_data['type'] = 'knowledge_base_response'
-    
-    # Handle: Cancel Order
-    elif intent == 'cancel_order' or intent == 'cancel_order_with_number':
-        if order_num:
-            order = query_order(order_num)
-            if order:
-                if order['status'] == 'processing':
-                    user_id = order['user_id']
-                    issue_desc = f"Cancel order request: Order #{order_num} - {order['items']}"
-                    ticket_id = create_ticket(user_id, issue_desc)
-                    
-                    if ticket_id:
-                        response_data['message'] = f"I've created a cancellation request for order #{order_num} ({order['items']}). Our team will process it within 24 hours. Ticket #{ticket_id}."
-                        response_data['type'] = 'escalation_confirmed'
-                        response_data['ticket_id'] = ticket_id
-                    else:
-                        response_data['message'] = "I'm sorry, I couldn't create the request. Please contact support@ecommerce.com"
-                        response_data['type'] = 'error'
-                elif order['status'] == 'shipped':
-                    response_data['message'] = f"Order #{order_num} ({order['items']}) has already shipped. You'll need to refuse delivery or return it after receiving."
-                    response_data['type'] = 'database_response'
-                elif order['status'] == 'cancelled':
-                    response_data['message'] = f"Order #{order_num} is already cancelled."
-                    response_data['type'] = 'database_response'
-                else:
-                    response_data['message'] = f"Order #{order_num} status is '{order['status']}'. Please contact support for assistance."
-                    response_data['type'] = 'database_response'
-            else:
-                response_data['message'] = f"I couldn't find order #{order_num}. Please verify the order number."
-                response_data['type'] = 'error'
-        else:
-            response_data['message'] = "I can help cancel your order. Please provide your order number."
-            response_data['type'] = 'clarification'
-            response_data['context']['awaiting_order_for_cancel'] = True
+        # Send the metadata first so the client can render the bubble immediately
+        meta = client_response(session_id, response_data)
+        yield sse_event('meta', {key: value for key, value in meta.items() if key != 'message'})
+        chunks = []
+        for chunk in stream_gemini_response(user_message, response_data['context']):
+            chunks.append(chunk)
+            yield sse_event('token', chunk)
+        response_data['message'] = ''.join(chunks)
+        log_conversation(user_message, 'general', response_data, data.get('user_id'))
+        yield sse_event('done', client_response(session_id, response_data))
     
-    # Handle: Contact Support
-    elif intent == 'contact_support':
-        response_data['message'] = KNOWLEDGE_BASE['customer_support']
-        response_data['type'] = 'knowledge_base_response'
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def bulk_order_status(data):
+    """Status of every order in data['order_ids'], returns (payload, http status)"""
+    order_ids = data.get('order_ids') if isinstance(data, dict) else None
+    if not isinstance(order_ids, list) or not order_ids:
+        return {'error': 'order_ids must be a non-empty list'}, 400
+    if len(order_ids) > BULK_ORDER_LIMIT:
+        return {'error': f'At most {BULK_ORDER_LIMIT} order_ids per request'}, 400
+    if not all(isinstance(order_id, (str, int)) and not isinstance(order_id, bool) for order_id in order_ids):
+        return {'error': 'order_ids must be strings or numbers'}, 400
     
-    # Handle: General
-    else:
-        kb_info = retrieve_from_knowledge_base(user_message)
-        if kb_info:
-            response_data['message'] = ' '.join(kb_info)
-            response_data['type'] = 'knowledge_base_response'
+    order_ids = list(dict.fromkeys(str(order_id).strip() for order_id in order_ids))
+    orders = query_orders(order_ids)
+    
+    results = []
+    for order_id in order_ids:
+        order = orders.get(order_id)
+        if order:
+            results.append({
+                'order_id': order_id,
+                'found': True,
+                'message': format_order_status_message(order),
+                'order_info': order
+            })
         else:
-            gemini_response = generate_gemini_response(user_message, conversation_context)
-            response_data['message'] = gemini_response
-            response_data['type'] = 'generated_response'
+            results.append({
+                'order_id': order_id,
+                'found': False,
+                'message': templates.render('track_orders', 'not_found', order_id=order_id)
+            })
+    return {'orders': results}, 200
+
+@app.route('/api/orders/bulk', methods=['POST'])
+def bulk_orders():
+    """Look up many orders in one request"""
+    payload, status = bulk_order_status(request.json or {})
+    return jsonify(payload), status
+
+@app.route('/api/chat/batch', methods=['POST'])
+def chat_batch():
+    """Batch chat endpoint: a JSONL body of {message, context} records in, JSONL results out"""
+    lines = request.get_data(as_text=True).splitlines()
+    replay = request.args.get('replay', 'true').lower() != 'false'
+    
+    def results():
+        for result in process_batch(lines, replay=replay):
+            yield app.json.dumps(result) + '\n'
     
-    return jsonify(response_data)
+    return Response(results(), mimetype='application/x-ndjson')
 
 @app.route('/api/create_ticket', methods=['POST'])
 def create_support_ticket():
@@ -589,10 +1084,17 @@ def create_support_ticket():
     data = request.json
     user_id = data.get('user_id', 1)
     issue = data.get('issue', '')
+    order_id = data.get('order_id')
     
-    ticket_id = create_ticket(user_id, issue)
+    ticket_id = create_ticket(user_id, issue, order_id)
     
-    if ticket_id:
+    if ticket_id == TICKET_PENDING:
+        return jsonify({
+            'success': True,
+            'pending': True,
+            'message': 'Your support ticket has been received and is being recorded. Our team will contact you within 24 hours.'
+        }), 202
+    elif ticket_id:
         return jsonify({
             'success': True,
             'ticket_id': ticket_id,
@@ -604,5 +1106,41 @@ def create_support_ticket():
             'message': 'Failed to create ticket. Please try again.'
         }), 500
 
+def collect_stats():
+    """Runtime statistics for the connection pool, caches and chat handlers"""
+    return {
+        'db_pool': db_pool.stats(),
+        'order_cache': order_cache.stats(),
+        'order_filter': order_filter.stats() if ORDER_FILTER_ENABLED else None,
+        'order_snapshot': order_snapshot.stats() if ORDER_SNAPSHOT_ENABLED else None,
+        'knowledge_base': kb_index.stats(),
+        'llm_cache': llm_cache.stats(),
+        'semantic_cache': semantic_cache.stats() if SEMANTIC_CACHE_ENABLED else None,
+        'llm_guard': llm_guard.stats(),
+        'prompts': prompt_builder.stats(),
+        'templates': templates.stats(),
+        'json': app.json.stats(),
+        'response_bodies': response_bodies.stats(),
+        'coalescing': {
+            'query_order': order_flight.stats(),
+            'gemini': llm_flight.stats()
+        },
+        'ticket_queue': ticket_queue.stats() if TICKET_QUEUE_ENABLED else None,
+        'conversation_log': conversation_log.stats() if CONVERSATION_LOG_ENABLED else None,
+        'sessions': session_store.stats(),
+        'tracing': tracer.stats(),
+        'handlers': handler_timing_stats()
+    }
+
+@app.route('/api/stats', methods=['GET'])
+def stats():
+    """Runtime statistics for the connection pool, caches and chat handlers"""
+    return jsonify(collect_stats())
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Stage latency histograms and error counters in the Prometheus text format"""
+    return Response(metrics_registry.render(), content_type=METRICS_CONTENT_TYPE)
+
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
\ No newline at end of file
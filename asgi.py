@@ -0,0 +1,357 @@
+"""
+ASGI serving mode for the E-commerce Support Chatbot
+Serves the same /api/chat, /api/chat/stream and /api/create_ticket contracts
+as the Flask app from a single asyncio event loop. Gemini calls are awaited
+natively (generate_content_async), and MySQL work runs in a bounded thread
+pool, so a conversation waiting on the model does not hold a worker.
+
+Run with:
+    python asgi.py
+    uvicorn asgi:application --port 5000
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import time
+from urllib.parse import parse_qs
+from concurrent.futures import ThreadPoolExecutor
+import app as chatbot
+from metrics import STAGE_SECONDS, LLM_FALLBACKS, COALESCED_REQUESTS
+from tracing import add_span
+from llm_guard import LLMUnavailable
+from singleflight import AsyncSingleFlight
+
+# MySQL calls are blocking; this bounds how many run at once
+executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('ASGI_EXECUTOR_WORKERS', '32')),
+    thread_name_prefix='chatbot-db'
+)
+
+CORS_HEADERS = [
+    (b'access-control-allow-origin', b'*'),
+    (b'access-control-allow-headers', b'Content-Type'),
+    (b'access-control-allow-methods', b'GET, POST, OPTIONS'),
+]
+
+# Identical questions in flight on the event loop share one Gemini call
+llm_flight = AsyncSingleFlight('gemini_async', on_join=COALESCED_REQUESTS.inc)
+
+with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates', 'index.html'), 'rb') as f:
+    INDEX_HTML = f.read()
+
+
+async def run_blocking(fn, *args, **kwargs):
+    """Run a blocking function (database work) in the bounded executor, in the caller's context"""
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(executor, functools.partial(context.run, fn, *args, **kwargs))
+
+
+async def call_gemini_async(query, db_info=None, kb_info=None):
+    """Awaitable version of chatbot.call_gemini"""
+    prompt = chatbot.build_prompt(query, db_info, kb_info)
+    if hasattr(chatbot.model, 'generate_content_async'):
+        # Capped at LLM_MAX_IN_FLIGHT, like the Flask path
+        response = await chatbot.llm_guard.acall(chatbot.model.generate_content_async, prompt)
+    else:
+        response = await run_blocking(chatbot.llm_guard.call, chatbot.model.generate_content, prompt)
+    chatbot.cache_response(query, response.text, db_info, kb_info)
+    return response.text
+
+
+async def generate_response_async(query, db_info=None, kb_info=None):
+    """Awaitable version of chatbot.generate_gemini_response"""
+    cached = chatbot.get_cached_response(query, db_info, kb_info)
+    if cached is not None:
+        return cached
+
+    start = time.perf_counter()
+    try:
+        key = chatbot.llm_cache.make_key(query, db_info, kb_info)
+        return await llm_flight.do(key, call_gemini_async, query, db_info, kb_info)
+    except LLMUnavailable:
+        LLM_FALLBACKS.inc('generate')
+        return chatbot.LLM_FALLBACK_MESSAGE
+    except Exception as e:
+        print(f"Error generating Gemini response: {e}")
+        LLM_FALLBACKS.inc('generate')
+        return chatbot.LLM_FALLBACK_MESSAGE
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, 'generate_gemini_response')
+        add_span('gemini_call', start, elapsed)
+
+
+async def stream_response_async(query, db_info=None, kb_info=None):
+    """Async generator version of chatbot.stream_gemini_response"""
+    cached = chatbot.get_cached_response(query, db_info, kb_info)
+    if cached is not None:
+        yield cached
+        return
+
+    prompt = chatbot.build_prompt(query, db_info, kb_info)
+    chunks = []
+    start = time.perf_counter()
+    try:
+        if hasattr(chatbot.model, 'generate_content_async'):
+            async for chunk in chatbot.llm_guard.astream(chatbot.model.generate_content_async, prompt, stream=True):
+                if chunk.text:
+                    chunks.append(chunk.text)
+                    yield chunk.text
+        else:
+            text = (await run_blocking(chatbot.llm_guard.call, chatbot.model.generate_content, prompt)).text
+            chunks.append(text)
+            yield text
+    except LLMUnavailable:
+        LLM_FALLBACKS.inc('stream')
+        yield chatbot.LLM_FALLBACK_MESSAGE
+        return
+    except Exception as e:
+        print(f"Error streaming Gemini response: {e}")
+        LLM_FALLBACKS.inc('stream')
+        if not chunks:
+            yield chatbot.LLM_FALLBACK_MESSAGE
+        return
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, 'stream_gemini_response')
+
+    chatbot.cache_response(query, ''.join(chunks), db_info, kb_info)
+
+
+def encode_json(data):
+    """Serialize like Flask's jsonify (handles datetime/Decimal from MySQL rows)"""
+    body = chatbot.cached_chat_body(data)
+    if body is not None:
+        return body
+    return chatbot.app.json.dumps_bytes(data)
+
+
+async def read_body(receive):
+    """Collect the full request body"""
+    body = b''
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get('body', b'')
+        more_body = message.get('more_body', False)
+    return body
+
+
+async def send_response(send, status, body, content_type=b'application/json', headers=()):
+    """Send a complete (non-streaming) response"""
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', content_type), (b'content-length', str(len(body)).encode())]
+                   + list(headers) + CORS_HEADERS
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def load_json_object(body):
+    """Decode a JSON request body, raising ValueError (answered with a 400) unless it is an object"""
+    data = json.loads(body or b'{}')
+    if not isinstance(data, dict):
+        raise ValueError("request body must be a JSON object")
+    return data
+
+
+def parse_chat_request(body):
+    """Return (message, request data) or None if there is no message"""
+    data = load_json_object(body)
+    user_message = data.get('message')
+    user_message = user_message.strip() if isinstance(user_message, str) else ''
+    return (user_message, data) if user_message else None
+
+
+async def chat(body):
+    """POST /api/chat"""
+    parsed = parse_chat_request(body)
+    if parsed is None:
+        return 400, {'error': 'No message provided'}
+
+    user_message, data = parsed
+    session_id, response_data = await run_blocking(chatbot.chat_turn, user_message, data, generate=False)
+    if response_data['message'] is None:
+        response_data['message'] = await generate_response_async(user_message)
+        chatbot.log_conversation(user_message, 'general', response_data, data.get('user_id'))
+    return 200, chatbot.client_response(session_id, response_data)
+
+
+async def chat_stream(body, send):
+    """POST /api/chat/stream"""
+    parsed = parse_chat_request(body)
+    if parsed is None:
+        await send_response(send, 400, encode_json({'error': 'No message provided'}))
+        return
+
+    user_message, data = parsed
+    session_id, response_data = await run_blocking(chatbot.chat_turn, user_message, data, generate=False)
+
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [(b'content-type', b'text/event-stream'), (b'cache-control', b'no-cache')] + CORS_HEADERS
+    })
+
+    async def emit(event, data):
+        await send({
+            'type': 'http.response.body',
+            'body': chatbot.sse_event(event, data).encode('utf-8'),
+            'more_body': True
+        })
+
+    if response_data['message'] is None:
+        meta = chatbot.client_response(session_id, response_data)
+        await emit('meta', {key: value for key, value in meta.items() if key != 'message'})
+        chunks = []
+        async for chunk in stream_response_async(user_message):
+            chunks.append(chunk)
+            await emit('token', chunk)
+        response_data['message'] = ''.join(chunks)
+        chatbot.log_conversation(user_message, 'general', response_data, data.get('user_id'))
+
+    await emit('done', chatbot.client_response(session_id, response_data))
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def chat_batch(scope, body, send):
+    """POST /api/chat/batch"""
+    query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+    replay = query.get('replay', ['true'])[0].lower() != 'false'
+    results = chatbot.process_batch(body.decode('utf-8').splitlines(), replay=replay)
+
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [(b'content-type', b'application/x-ndjson')] + CORS_HEADERS
+    })
+    while True:
+        # Each chunk of records is processed inside one next() call, off the event loop
+        result = await run_blocking(next, results, None)
+        if result is None:
+            break
+        await send({'type': 'http.response.body', 'body': encode_json(result) + b'\n', 'more_body': True})
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def create_ticket(body):
+    """POST /api/create_ticket"""
+    data = load_json_object(body)
+    user_id = data.get('user_id', 1)
+    issue = data.get('issue', '')
+    order_id = data.get('order_id')
+
+    ticket_id = await run_blocking(chatbot.create_ticket, user_id, issue, order_id)
+
+    if ticket_id == chatbot.TICKET_PENDING:
+        return 202, {
+            'success': True,
+            'pending': True,
+            'message': 'Your support ticket has been received and is being recorded. Our team will contact you within 24 hours.'
+        }
+    if ticket_id:
+        return 200, {
+            'success': True,
+            'ticket_id': ticket_id,
+            'message': f'Support ticket #{ticket_id} has been created. Our team will contact you within 24 hours.'
+        }
+    return 500, {
+        'success': False,
+        'message': 'Failed to create ticket. Please try again.'
+    }
+
+
+async def bulk_orders(body):
+    """POST /api/orders/bulk"""
+    payload, status = await run_blocking(chatbot.bulk_order_status, json.loads(body or b'{}'))
+    return status, payload
+
+
+async def stats(body):
+    """GET /api/stats"""
+    stats = chatbot.collect_stats()
+    stats['coalescing']['gemini_async'] = llm_flight.stats()
+    return 200, stats
+
+
+def trace_request(method, path, scope):
+    """Trace /api/chat like the Flask app; spans only, as the event loop thread is shared"""
+    if (method, path) != ('POST', '/api/chat'):
+        return contextlib.nullcontext()
+    trace_id = dict(scope['headers']).get(b'x-trace-id', b'').decode('latin-1')
+    return chatbot.tracer.request(trace_id, name=path, sample=False)
+
+
+JSON_ROUTES = {
+    ('POST', '/api/chat'): chat,
+    ('POST', '/api/create_ticket'): create_ticket,
+    ('POST', '/api/orders/bulk'): bulk_orders,
+    ('GET', '/api/stats'): stats,
+}
+
+
+async def application(scope, receive, send):
+    """ASGI entry point"""
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                executor.shutdown(wait=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    if scope['type'] != 'http':
+        return
+
+    method, path = scope['method'], scope['path']
+    body = await read_body(receive)
+
+    if method == 'OPTIONS':
+        await send_response(send, 204, b'')
+        return
+
+    if method == 'GET' and path == '/':
+        await send_response(send, 200, INDEX_HTML, content_type=b'text/html; charset=utf-8')
+        return
+
+    if method == 'GET' and path == '/metrics':
+        await send_response(send, 200, chatbot.metrics_registry.render().encode('utf-8'),
+                            content_type=chatbot.METRICS_CONTENT_TYPE.encode())
+        return
+
+    if method == 'POST' and path == '/api/chat/stream':
+        try:
+            await chat_stream(body, send)
+        except ValueError:
+            await send_response(send, 400, encode_json({'error': 'Invalid JSON'}))
+        return
+
+    if method == 'POST' and path == '/api/chat/batch':
+        await chat_batch(scope, body, send)
+        return
+
+    handler = JSON_ROUTES.get((method, path))
+    if handler is None:
+        await send_response(send, 404, encode_json({'error': 'Not found'}))
+        return
+
+    trace = None
+    try:
+        with trace_request(method, path, scope) as trace:
+            status, data = await handler(body)
+    except ValueError:
+        status, data = 400, {'error': 'Invalid JSON'}
+    headers = [(b'x-trace-id', trace.trace_id.encode())] if trace is not None else []
+    await send_response(send, status, encode_json(data), headers=headers)
+
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run('asgi:application', host='127.0.0.1', port=int(os.getenv('FLASK_PORT', '5000')))
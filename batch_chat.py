@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Batch chat runner for the E-commerce Support Chatbot
+Runs a JSONL file of {"message": ..., "context": {...}} records through the
+same pipeline as /api/chat/batch and writes one JSON result per line. Use it
+to replay transcripts through new intent logic or to pre-warm the caches.
+
+By default records are replayed: no tickets are created and nothing is
+written to conversation_history. Pass --live to run them for real.
+
+Usage:
+    python batch_chat.py transcripts.jsonl -o results.jsonl
+    cat transcripts.jsonl | python batch_chat.py - > results.jsonl
+"""
+
+import argparse
+import sys
+import time
+import app as chatbot
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', help="JSONL file of chat records, or '-' for stdin")
+    parser.add_argument('-o', '--output', help='file to write JSONL results to (default: stdout)')
+    parser.add_argument('--live', action='store_true', help='create tickets and log conversations')
+    args = parser.parse_args()
+
+    source = sys.stdin if args.input == '-' else open(args.input, encoding='utf-8')
+    target = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+
+    count = errors = 0
+    start = time.perf_counter()
+    try:
+        for result in chatbot.process_batch(source, replay=not args.live):
+            target.write(chatbot.app.json.dumps(result) + '\n')
+            count += 1
+            errors += 'error' in result
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if target is not sys.stdout:
+            target.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"Processed {count} records ({errors} errors) in {elapsed:.2f}s "
+          f"({count / elapsed if elapsed else 0:,.0f} records/sec)", file=sys.stderr)
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
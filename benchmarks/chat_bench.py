@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Chat Endpoint Benchmark
+Drives /api/chat through the Flask test client with a realistic mix of
+intents, against in-process stand-ins for MySQL (SQLite seeded from
+database_setup.sql) and Gemini (canned replies), and reports throughput and
+p50/p95/p99 latency per intent. Results are saved as JSON so that runs can be
+compared between commits. No MySQL server or Gemini key is needed.
+
+Usage:
+    python benchmarks/chat_bench.py [--requests 5000] [--db-latency-ms 0.5] [--llm-latency-ms 50]
+    python benchmarks/chat_bench.py --compare benchmarks/results/chat_bench-<commit>.json
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import app as chatbot
+import fakes
+
+SAMPLE_ORDERS = ['12345', '12346', '12347', '12348', '12349', '12350']
+
+# (label, weight, message templates). {order} is an existing order, {missing}
+# one that does not exist and {n} a number that makes the question unique-ish.
+WORKLOAD = [
+    ('track_order', 30, ['Where is my order {order}?', 'Track order {order}', '{order}', "What's the status of {order}?"]),
+    ('unknown_order', 5, ['Where is my order {missing}?', '{missing}']),
+    ('return_item', 8, ['I want to return order {order}', 'Can I get a refund for {order}?']),
+    ('cancel_order', 7, ['Cancel order {order}', 'Please cancel {order}']),
+    ('change_address', 5, ['Change address for order {order}', 'I need to update the address on {order}']),
+    ('shipping_info', 10, ['What are the shipping options?', 'How long does shipping take?']),
+    ('payment_info', 10, ['What payment methods do you accept?', 'Can I pay with UPI?']),
+    ('contact_support', 5, ['How do I contact support?', 'I want to talk to an agent']),
+    ('knowledge_base', 10, ['What warranty do your products come with?', 'Is an extended warranty available?']),
+    ('generated', 10, ['Is model {n} waterproof?', 'Which sizes are in stock for style {n}?',
+                       'Is there a loyalty programme for member {n}?']),
+]
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies, elapsed=None):
+    """Latency summary (ms) for one group of requests"""
+    values = sorted(latencies)
+    summary = {
+        'count': len(values),
+        'mean_ms': round(sum(values) / len(values), 3) if values else 0.0,
+        'p50_ms': round(percentile(values, 50), 3),
+        'p95_ms': round(percentile(values, 95), 3),
+        'p99_ms': round(percentile(values, 99), 3),
+        'max_ms': round(values[-1], 3) if values else 0.0
+    }
+    if elapsed:
+        summary['throughput_rps'] = round(len(values) / elapsed, 1)
+    return summary
+
+
+def build_requests(count, orders, rng):
+    """Draw `count` (label, message) pairs from the workload mix"""
+    labels = [label for label, _weight, _templates in WORKLOAD]
+    weights = [weight for _label, weight, _templates in WORKLOAD]
+    templates = {label: messages for label, _weight, messages in WORKLOAD}
+
+    requests = []
+    for label in rng.choices(labels, weights=weights, k=count):
+        message = rng.choice(templates[label]).format(
+            order=rng.choice(orders),
+            missing=rng.randint(90000, 99999),
+            n=rng.randint(1, 500)
+        )
+        requests.append((label, message))
+    return requests
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def run(args):
+    database, model = fakes.install(chatbot, db_latency=args.db_latency_ms / 1000,
+                                    llm_latency=args.llm_latency_ms / 1000, orders=args.orders)
+    rng = random.Random(args.seed)
+    orders = SAMPLE_ORDERS + [str(20000 + i) for i in range(args.orders)]
+    client = chatbot.app.test_client()
+
+    for _label, message in build_requests(args.warmup, orders, rng):
+        client.post('/api/chat', json={'message': message, 'context': {}})
+
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    response_types = defaultdict(int)
+    queries_before, llm_calls_before = database.queries, model.calls
+
+    workload = build_requests(args.requests, orders, rng)
+    start = time.perf_counter()
+    for label, message in workload:
+        t0 = time.perf_counter()
+        response = client.post('/api/chat', json={'message': message, 'context': {}})
+        latencies[label].append((time.perf_counter() - t0) * 1000)
+        if response.status_code != 200:
+            errors[label] += 1
+        else:
+            response_types[response.get_json()['type']] += 1
+    elapsed = time.perf_counter() - start
+
+    intents = {}
+    for label, _weight, _templates in WORKLOAD:
+        if latencies[label]:
+            intents[label] = summarize(latencies[label])
+            intents[label]['errors'] = errors[label]
+
+    return {
+        'meta': {
+            'benchmark': 'chat_bench',
+            'commit': git_commit(),
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'args': vars(args)
+        },
+        'overall': dict(summarize([v for values in latencies.values() for v in values], elapsed),
+                        elapsed_s=round(elapsed, 3), errors=sum(errors.values())),
+        'intents': intents,
+        'response_types': dict(response_types),
+        'backend_calls': {
+            'db_queries': database.queries - queries_before,
+            'llm_calls': model.calls - llm_calls_before
+        },
+        'stats': chatbot.collect_stats()
+    }
+
+
+def print_report(result, baseline=None):
+    overall = result['overall']
+    print(f"{overall['count']} requests in {overall['elapsed_s']}s: {overall['throughput_rps']:,.1f} req/s, "
+          f"{overall['errors']} errors, {result['backend_calls']['db_queries']} DB queries, "
+          f"{result['backend_calls']['llm_calls']} LLM calls")
+    print(f"{'intent':<16}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}" + ('   p50 vs baseline' if baseline else ''))
+
+    rows = list(result['intents'].items()) + [('overall', overall)]
+    for label, summary in rows:
+        line = f"{label:<16}{summary['count']:>7}{summary['p50_ms']:>10.3f}{summary['p95_ms']:>10.3f}{summary['p99_ms']:>10.3f}"
+        if baseline:
+            before = baseline['overall'] if label == 'overall' else baseline['intents'].get(label)
+            if before and before['p50_ms']:
+                line += f"   {(summary['p50_ms'] - before['p50_ms']) / before['p50_ms'] * 100:+7.1f}%"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=5000, help='measured requests')
+    parser.add_argument('--warmup', type=int, default=200, help='unmeasured requests sent first')
+    parser.add_argument('--db-latency-ms', type=float, default=0.5, help='added to every fake MySQL round trip')
+    parser.add_argument('--llm-latency-ms', type=float, default=50.0, help='added to every fake Gemini call')
+    parser.add_argument('--orders', type=int, default=1000, help='synthetic orders added to the sample data')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='JSON results file (default: benchmarks/results/chat_bench-<commit>.json)')
+    parser.add_argument('--compare', help='earlier results file to compare p50 latencies against')
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    result = run(args)
+    print_report(result, baseline)
+
+    output = args.output or os.path.join(ROOT, 'benchmarks', 'results', f"chat_bench-{result['meta']['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent=2, default=str)
+    print(f"Results saved to {output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,233 @@
+"""
+In-process stand-ins for MySQL and Gemini used by the benchmarks
+FakeDatabase loads database_setup.sql into an in-memory SQLite database and
+hands out connections that behave like mysql.connector ones (%s parameters,
+dictionary cursors, lastrowid). FakeModel answers like a Gemini
+GenerativeModel with a canned reply. Both can add a fixed latency per call to
+stand in for the network round trip.
+"""
+
+import asyncio
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCHEMA_FILE = os.path.join(ROOT, 'database_setup.sql')
+
+sqlite3.register_adapter(Decimal, str)
+sqlite3.register_converter('DECIMAL', lambda value: Decimal(value.decode()))
+sqlite3.register_converter('DATETIME', lambda value: datetime.fromisoformat(value.decode()))
+
+
+def mysql_to_sqlite(sql):
+    """Translate the statements in database_setup.sql to SQLite, skipping what SQLite has no use for"""
+    lines = [line for line in sql.splitlines() if not line.strip().startswith('--')]
+    statements = []
+    for statement in '\n'.join(lines).split(';'):
+        statement = statement.strip()
+        keyword = statement.split(None, 1)[0].upper() if statement else ''
+        if keyword not in ('CREATE', 'INSERT'):
+            continue  # CREATE DATABASE / USE / verification SELECTs
+        if statement.upper().startswith('CREATE DATABASE'):
+            continue
+
+        statement = re.sub(r'INT AUTO_INCREMENT PRIMARY KEY', 'INTEGER PRIMARY KEY AUTOINCREMENT', statement)
+        statement = re.sub(r"ENUM\([^)]*\)", 'TEXT', statement)
+        statement = re.sub(r',\s*INDEX \w+ \([^)]*\)', '', statement)
+        statement = statement.replace('CREATE OR REPLACE VIEW', 'CREATE VIEW IF NOT EXISTS')
+        statements.append(statement)
+    return statements
+
+
+class FakeCursor:
+    """mysql.connector-style cursor over a SQLite cursor"""
+
+    def __init__(self, connection, dictionary=False):
+        self._db = connection._db
+        self._cursor = self._db.conn.cursor()
+        self._dictionary = dictionary
+        self.lastrowid = None
+        self.rowcount = -1
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def _row(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return dict(zip([column[0] for column in self._cursor.description], row))
+
+    def execute(self, query, params=()):
+        self._db.round_trip()
+        with self._db.lock:
+            self._cursor.execute(query.replace('%s', '?'), tuple(params or ()))
+            self.lastrowid = self._cursor.lastrowid
+            self.rowcount = self._cursor.rowcount
+            self._rows = self._cursor.fetchall() if self._cursor.description else []
+        self._position = 0
+
+    def executemany(self, query, seq_params):
+        # One round trip for the whole batch, like a multi-row INSERT
+        self._db.round_trip()
+        ids = []
+        with self._db.lock:
+            for params in seq_params:
+                self._cursor.execute(query.replace('%s', '?'), tuple(params))
+                ids.append(self._cursor.lastrowid)
+        self.lastrowid = ids[0] if ids else None
+        self.rowcount = len(ids)
+        self._rows = []
+        self._position = 0
+
+    def fetchone(self):
+        if self._position >= len(self._rows):
+            return None
+        self._position += 1
+        return self._row(self._rows[self._position - 1])
+
+    def fetchall(self):
+        rows = self._rows[self._position:]
+        self._position = len(self._rows)
+        return [self._row(row) for row in rows]
+
+    def close(self):
+        self._cursor.close()
+
+
+class FakeConnection:
+    """mysql.connector-style connection; close() is a no-op"""
+
+    in_transaction = False
+
+    def __init__(self, db):
+        self._db = db
+
+    def cursor(self, dictionary=False):
+        return FakeCursor(self, dictionary)
+
+    def commit(self):
+        self._db.round_trip()
+        with self._db.lock:
+            self._db.conn.commit()
+
+    def rollback(self):
+        pass
+
+    def ping(self, reconnect=False, attempts=1, delay=0):
+        pass
+
+    def is_connected(self):
+        return True
+
+    def close(self):
+        pass
+
+
+class FakeDatabase:
+    """SQLite database seeded from database_setup.sql
+
+    latency:  seconds added to every execute/commit (network round trip)
+    orders:   extra synthetic orders to add beyond the sample data
+    """
+
+    def __init__(self, latency=0.0, orders=0, schema_file=SCHEMA_FILE):
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(':memory:', check_same_thread=False, detect_types=sqlite3.PARSE_DECLTYPES)
+        self.queries = 0
+
+        with open(schema_file, encoding='utf-8') as f:
+            for statement in mysql_to_sqlite(f.read()):
+                self.conn.execute(statement)
+        if orders:
+            self.add_orders(orders)
+        self.conn.commit()
+
+    def add_orders(self, count, first_id=20000):
+        """Insert synthetic orders numbered from first_id, spread over the sample users and statuses"""
+        statuses = ('processing', 'shipped', 'delivered', 'cancelled')
+        now = datetime.now()
+        self.conn.executemany(
+            "INSERT INTO orders (order_id, user_id, status, items, total_amount, order_date, estimated_delivery, tracking_number)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (str(first_id + i), i % 4 + 1, statuses[i % 4], f'Item #{i}', Decimal('49.99'),
+                 now - timedelta(hours=i), f'{i % 7 + 1} days', f'TRK{first_id + i}' if i % 4 == 1 else None)
+                for i in range(count)
+            ]
+        )
+
+    def round_trip(self):
+        self.queries += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def connect(self):
+        """Drop-in replacement for app.get_db_connection"""
+        return FakeConnection(self)
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModel:
+    """Canned-reply stand-in for genai.GenerativeModel
+
+    latency:  seconds each generate_content call takes (spread across chunks when streaming)
+    """
+
+    def __init__(self, latency=0.0, reply="Thanks for your question! Our support team is happy to help with that.",
+                 chunks=4):
+        self.latency = latency
+        self.reply = reply
+        self.chunks = chunks
+        self.calls = 0
+
+    def _pieces(self):
+        words = self.reply.split(' ')
+        size = max(1, -(-len(words) // self.chunks))
+        return [' '.join(words[i:i + size]) + (' ' if i + size < len(words) else '')
+                for i in range(0, len(words), size)]
+
+    def _stream(self):
+        pieces = self._pieces()
+        for piece in pieces:
+            time.sleep(self.latency / len(pieces))
+            yield FakeResponse(piece)
+
+    def generate_content(self, prompt, stream=False):
+        self.calls += 1
+        if stream:
+            return self._stream()
+        time.sleep(self.latency)
+        return FakeResponse(self.reply)
+
+    async def _astream(self):
+        pieces = self._pieces()
+        for piece in pieces:
+            await asyncio.sleep(self.latency / len(pieces))
+            yield FakeResponse(piece)
+
+    async def generate_content_async(self, prompt, stream=False):
+        self.calls += 1
+        if stream:
+            return self._astream()
+        await asyncio.sleep(self.latency)
+        return FakeResponse(self.reply)
+
+
+def install(app_module, db_latency=0.0, llm_latency=0.0, orders=0):
+    """Point an imported app module at fresh fakes, returns (database, model)"""
+    database = FakeDatabase(latency=db_latency, orders=orders)
+    model = FakeModel(latency=llm_latency)
+    app_module.get_db_connection = database.connect
+    app_module.model = model
+    return database, model
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Intent Classification Microbenchmark
+Compares classify_message() in intents.py against the original
+keyword-list implementation of detect_intent + extract_order_number, checks
+that both return the same (intent, order number) for every message, and
+reports messages/sec for each.
+
+Usage:
+    python benchmarks/intent_bench.py [--seconds 2]
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from intents import classify_message
+
+MESSAGES = [
+    "Where is my order 12345?",
+    "12345",
+    "  12347  ",
+    "Track my package please",
+    "I want to return an item",
+    "Return order 12347",
+    "I need a refund for 12348",
+    "Can I send back the shoes?",
+    "Cancel order 12346",
+    "please stop order 12349",
+    "What are shipping options?",
+    "How long does shipping take?",
+    "What are your delivery options?",
+    "What payment methods do you accept?",
+    "Can I pay with Paytm or UPI?",
+    "Change address for 12349",
+    "I need to update my delivery address",
+    "How do I contact support?",
+    "I want to speak to an agent",
+    "Tell me about your store",
+    "Do you have gift cards?",
+    "hello",
+    "my pin is 56001, can you ship there?",
+    "where's my stuff",
+    "What is the status of 12350 and 12345?",
+    "Is there a warranty on laptops?",
+]
+
+CONTEXTS = [
+    {},
+    {'awaiting_return_order_number': True},
+    {'awaiting_order_for_cancel': True},
+    {'awaiting_order_for_address': True},
+]
+
+
+# ---------- Original implementation, kept verbatim as the baseline ----------
+
+def legacy_extract_order_number(query):
+    query_stripped = query.strip()
+    if query_stripped.isdigit() and len(query_stripped) == 5:
+        return query_stripped
+    match = re.search(r'\b\d{5}\b', query)
+    return match.group(0) if match else None
+
+
+def legacy_is_standalone_order_number(query):
+    query_stripped = query.strip()
+    return query_stripped.isdigit() and len(query_stripped) == 5
+
+
+def legacy_detect_intent(query, context):
+    query_lower = query.lower().strip()
+    if legacy_is_standalone_order_number(query):
+        if context.get('awaiting_return_order_number'):
+            return 'return_item_with_order'
+        elif context.get('awaiting_order_for_cancel'):
+            return 'cancel_order_with_number'
+        elif context.get('awaiting_order_for_address'):
+            return 'change_address_with_number'
+        else:
+            return 'track_order'
+    has_order_number = legacy_extract_order_number(query) is not None
+    if any(word in query_lower for word in ['return', 'refund', 'send back']):
+        if has_order_number:
+            return 'return_item_with_order'
+        return 'return_item'
+    if any(word in query_lower for word in ['track', 'status', 'where is', 'where\'s', 'delivery', 'order']):
+        if 'return' not in query_lower and 'refund' not in query_lower and 'cancel' not in query_lower:
+            return 'track_order'
+    if any(word in query_lower for word in ['shipping', 'ship', 'delivery options', 'how long']):
+        if 'track' not in query_lower and 'where' not in query_lower and not has_order_number:
+            return 'shipping_info'
+    if any(word in query_lower for word in ['payment', 'pay', 'card', 'upi', 'paytm']):
+        return 'payment_info'
+    if any(word in query_lower for word in ['cancel', 'stop order']):
+        return 'cancel_order'
+    if 'address' in query_lower and ('change' in query_lower or 'update' in query_lower or 'modify' in query_lower):
+        return 'change_address'
+    if any(word in query_lower for word in ['contact', 'support', 'help', 'speak to', 'talk to', 'agent']):
+        return 'contact_support'
+    return 'general'
+
+
+def legacy(message, context):
+    """What chat() used to do: two separate passes"""
+    return legacy_detect_intent(message, context), legacy_extract_order_number(message)
+
+
+def compiled(message, context):
+    intent, numbers = classify_message(message, context)
+    return intent, (numbers[0] if numbers else None)
+
+
+# ---------------------------------------------------------------------------
+
+def check_parity():
+    """Both implementations must agree on every message/context pair"""
+    mismatches = 0
+    for message in MESSAGES:
+        for context in CONTEXTS:
+            expected = legacy(message, context)
+            actual = compiled(message, context)
+            if expected != actual:
+                mismatches += 1
+                print(f"MISMATCH {message!r} {context}: legacy={expected} compiled={actual}")
+    return mismatches
+
+
+def measure(fn, seconds):
+    """Run fn over the corpus repeatedly for ~seconds, return messages/sec"""
+    pairs = [(m, c) for m in MESSAGES for c in CONTEXTS]
+    count = 0
+    start = time.perf_counter()
+    deadline = start + seconds
+    while time.perf_counter() < deadline:
+        for message, context in pairs:
+            fn(message, context)
+        count += len(pairs)
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=float, default=2.0, help='time budget per implementation')
+    args = parser.parse_args()
+
+    mismatches = check_parity()
+    print(f"Parity: {len(MESSAGES) * len(CONTEXTS) - mismatches}/{len(MESSAGES) * len(CONTEXTS)} cases match")
+
+    before = measure(legacy, args.seconds)
+    after = measure(compiled, args.seconds)
+    print(f"legacy   (detect_intent + extract_order_number): {before:>12,.0f} msgs/sec")
+    print(f"compiled (classify_message):                     {after:>12,.0f} msgs/sec")
+    print(f"speedup: {after / before:.2f}x")
+
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+JSON Response Encoding Microbenchmark
+Compares the original /api/chat serialization path (Flask's default jsonify
+over raw MySQL rows holding datetime and Decimal values) with the current
+one (FastJSONProvider over rows converted to plain types at fetch time).
+Checks that both backends decode to the same values for the same payload
+and reports response bytes/sec and responses/sec for each payload shape.
+
+Usage:
+    python benchmarks/json_bench.py [--seconds 2] [--backend auto|orjson|json]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from json_provider import FastJSONProvider, plain_row
+
+ITEMS = ['Running Shoes - Nike Air Max', 'Laptop - Dell XPS 15', 'Headphones - Sony WH-1000XM5',
+         'Wireless Mouse - Logitech MX', 'Smart Watch - Apple Watch Series 9 (Café edition)']
+STATUSES = ['shipped', 'processing', 'delivered', 'cancelled']
+
+
+def raw_order(n):
+    """An orders JOIN users row as mysql-connector returns it"""
+    return {
+        'order_id': str(12345 + n),
+        'user_id': 1 + n % 50,
+        'status': STATUSES[n % len(STATUSES)],
+        'items': ITEMS[n % len(ITEMS)],
+        'total_amount': Decimal('1299.99') + n,
+        'order_date': datetime(2024, 1, 15, 10, 30) + timedelta(hours=n),
+        'estimated_delivery': '3 days',
+        'tracking_number': f"TRK{123456789 + n}",
+        'name': 'John Doe',
+        'email': 'john@example.com'
+    }
+
+
+def payloads(rows):
+    """(name, payload) pairs shaped like the app's responses, built from the given rows"""
+    return [
+        ('clarification', {
+            'message': "I can help track your order! Please provide your 5-digit order number.",
+            'type': 'clarification',
+            'needs_escalation': False,
+            'session_id': 'q3hG8kZ0c1xR5vN2aW7yTg'
+        }),
+        ('track_order', {
+            'message': f"Your order #{rows[0]['order_id']} ({rows[0]['items']}) is on its way and should arrive within 3 days.",
+            'type': 'database_response',
+            'needs_escalation': False,
+            'session_id': 'q3hG8kZ0c1xR5vN2aW7yTg',
+            'order_info': rows[0]
+        }),
+        ('track_orders x10', {
+            'message': '\n'.join(f"Your order #{row['order_id']} status: {row['status']}." for row in rows[:10]),
+            'type': 'database_response',
+            'needs_escalation': False,
+            'session_id': 'q3hG8kZ0c1xR5vN2aW7yTg',
+            'orders_info': rows[:10]
+        }),
+        ('bulk x100', {
+            'orders': [{'order_id': row['order_id'], 'found': True, 'message': f"Order #{row['order_id']}",
+                        'order_info': row} for row in rows[:100]]
+        }),
+    ]
+
+
+def body(provider, payload):
+    """What jsonify() sends: the provider's response body"""
+    return provider.response(payload).get_data()
+
+
+def check_parity(fast, default, cases):
+    """Both backends must produce the same JSON values for the same payload"""
+    mismatches = 0
+    for name, payload in cases:
+        if json.loads(body(fast, payload)) != json.loads(body(default, payload)):
+            mismatches += 1
+            print(f"MISMATCH {name}")
+    return mismatches
+
+
+def measure(provider, payload, seconds):
+    """Serialize payload repeatedly for ~seconds, return (bytes/sec, responses/sec)"""
+    count = 0
+    size = 0
+    start = time.perf_counter()
+    deadline = start + seconds
+    while time.perf_counter() < deadline:
+        for _ in range(50):
+            size += len(body(provider, payload))
+        count += 50
+    elapsed = time.perf_counter() - start
+    return size / elapsed, count / elapsed
+
+
+def measure_rows(rows, seconds):
+    """plain_row() conversions/sec, the one-off cost now paid at fetch time"""
+    count = 0
+    start = time.perf_counter()
+    deadline = start + seconds
+    while time.perf_counter() < deadline:
+        for row in rows:
+            plain_row(row)
+        count += len(rows)
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=float, default=2.0, help='time budget per payload and path')
+    parser.add_argument('--backend', default='auto', help='FastJSONProvider backend: auto, orjson or json')
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    default = DefaultJSONProvider(app)
+    fast = FastJSONProvider(app, backend=args.backend)
+
+    raw_rows = [raw_order(n) for n in range(100)]
+    plain_rows = [plain_row(row) for row in raw_rows]
+    before_cases = payloads(raw_rows)
+    after_cases = payloads(plain_rows)
+
+    cases = before_cases + after_cases
+    mismatches = check_parity(fast, default, cases)
+    print(f"Parity: {len(cases) - mismatches}/{len(cases)} payloads decode identically on both backends")
+    print(f"Backend: {fast.backend}\n")
+
+    print(f"{'payload':<18} {'before MB/s':>12} {'after MB/s':>12} {'before resp/s':>14} {'after resp/s':>14} {'speedup':>8}")
+    for (name, before_payload), (_, after_payload) in zip(before_cases, after_cases):
+        before_bytes, before_rate = measure(default, before_payload, args.seconds)
+        after_bytes, after_rate = measure(fast, after_payload, args.seconds)
+        print(f"{name:<18} {before_bytes / 1e6:>12.1f} {after_bytes / 1e6:>12.1f} "
+              f"{before_rate:>14,.0f} {after_rate:>14,.0f} {after_rate / before_rate:>7.2f}x")
+
+    print(f"\nplain_row at fetch time: {measure_rows(raw_rows, args.seconds):,.0f} rows/sec")
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
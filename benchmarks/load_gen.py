@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Multi-user Conversation Load Generator
+Simulates many customers running multi-turn flows against /api/chat at the
+same time (track, return -> cancel, cancel, address change), carrying the
+conversation state between turns, and reports per-flow completion latency
+and error rate.
+
+By default it starts the app in-process on a free local port, backed by the
+SQLite/canned-Gemini stand-ins from fakes.py, so it runs fully offline. Pass
+--url to drive an instance that is already running locally instead.
+
+Arrival models:
+    closed  --users N customers, each starting its next flow when the last ends
+    open    new flows arrive at --rate per second (Poisson) however slow the
+            server is; latency is measured from the scheduled arrival time
+
+Usage:
+    python benchmarks/load_gen.py --model closed --users 50 --duration 20
+    python benchmarks/load_gen.py --model open --rate 200 --duration 20
+    python benchmarks/load_gen.py --url http://127.0.0.1:5000 --users 20
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from chat_bench import summarize, git_commit
+
+# Each flow is a list of (message template, expected response type).
+# {order} is any existing order, {processing} one that can still be cancelled.
+FLOWS = {
+    'track': [
+        ('Where is my order?', 'clarification'),
+        ('{order}', 'database_response'),
+    ],
+    'return_then_cancel': [
+        ('I want to return an item', 'clarification'),
+        ('{processing}', 'database_response'),
+        ('yes', 'escalation_confirmed'),
+    ],
+    'cancel': [
+        ('I want to cancel my order', 'clarification'),
+        ('{processing}', 'escalation_confirmed'),
+    ],
+    'address_change': [
+        ('I want to change my address', 'clarification'),
+        ('{processing}', 'escalation'),
+        ('yes', 'escalation_confirmed'),
+    ],
+}
+FLOW_WEIGHTS = {'track': 50, 'return_then_cancel': 15, 'cancel': 20, 'address_change': 15}
+
+SAMPLE_ORDERS = ['12345', '12346', '12347', '12348', '12349', '12350']
+SAMPLE_PROCESSING = ['12346', '12349']
+
+
+class FlowError(Exception):
+    pass
+
+
+class ChatClient:
+    """Minimal HTTP client for /api/chat (one connection per request, like a browser fetch)"""
+
+    def __init__(self, url, timeout=30):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.timeout = timeout
+
+    def post(self, payload):
+        connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        try:
+            body = json.dumps(payload)
+            connection.request('POST', '/api/chat', body=body, headers={'Content-Type': 'application/json'})
+            response = connection.getresponse()
+            data = response.read()
+            if response.status != 200:
+                raise FlowError(f"HTTP {response.status}")
+            return json.loads(data)
+        finally:
+            connection.close()
+
+
+class Results:
+    """Thread-safe per-flow latencies and error counts"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.error_kinds = defaultdict(int)
+        self.started = defaultdict(int)
+
+    def start(self, flow):
+        with self.lock:
+            self.started[flow] += 1
+
+    def success(self, flow, elapsed_ms):
+        with self.lock:
+            self.latencies[flow].append(elapsed_ms)
+
+    def failure(self, flow, kind):
+        with self.lock:
+            self.errors[flow] += 1
+            self.error_kinds[kind] += 1
+
+
+def run_flow(client, name, rng, orders, processing, state, think):
+    """Run one conversation; raises FlowError when a turn goes wrong"""
+    order = rng.choice(orders)
+    pending = rng.choice(processing)
+    context, session_id = {}, None
+
+    for template, expected in FLOWS[name]:
+        message = template.format(order=order, processing=pending)
+        payload = {'message': message}
+        if state == 'session':
+            payload['session_id'] = session_id
+        else:
+            payload['context'] = context
+
+        data = client.post(payload)
+        if data.get('type') != expected:
+            raise FlowError(f"{name}: expected {expected}, got {data.get('type')}")
+        context = data.get('context', {})
+        session_id = data.get('session_id')
+        if think:
+            time.sleep(rng.expovariate(1 / think))
+
+
+def timed_flow(client, results, name, rng, args, orders, processing, scheduled=None):
+    """Run a flow and record its completion latency (from `scheduled` if given)"""
+    start = scheduled if scheduled is not None else time.perf_counter()
+    results.start(name)
+    try:
+        run_flow(client, name, rng, orders, processing, args.state, args.think_ms / 1000)
+    except FlowError as e:
+        results.failure(name, str(e))
+        return
+    except (OSError, http.client.HTTPException, ValueError) as e:
+        results.failure(name, type(e).__name__)
+        return
+    results.success(name, (time.perf_counter() - start) * 1000)
+
+
+def pick_flow(rng):
+    return rng.choices(list(FLOW_WEIGHTS), weights=list(FLOW_WEIGHTS.values()))[0]
+
+
+def closed_loop(client, results, args, orders, processing):
+    deadline = time.perf_counter() + args.duration
+
+    def user(seed):
+        rng = random.Random(seed)
+        while time.perf_counter() < deadline:
+            timed_flow(client, results, pick_flow(rng), rng, args, orders, processing)
+
+    threads = [threading.Thread(target=user, args=(args.seed + i,), daemon=True) for i in range(args.users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def open_loop(client, results, args, orders, processing):
+    rng = random.Random(args.seed)
+    start = time.perf_counter()
+    next_arrival = start
+    with ThreadPoolExecutor(max_workers=args.max_in_flight) as executor:
+        while True:
+            next_arrival += rng.expovariate(args.rate)
+            if next_arrival - start >= args.duration:
+                break
+            delay = next_arrival - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(timed_flow, client, results, pick_flow(rng), random.Random(rng.random()),
+                            args, orders, processing, next_arrival)
+
+
+def start_local_server(args):
+    """Serve the app with the offline stand-ins on a free port, returns its URL"""
+    from werkzeug.serving import make_server, WSGIRequestHandler
+    import app as chatbot
+    import fakes
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    fakes.install(chatbot, db_latency=args.db_latency_ms / 1000, llm_latency=args.llm_latency_ms / 1000,
+                  orders=args.orders)
+    server = make_server('127.0.0.1', 0, chatbot.app, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='running local instance to test (default: start one in-process with fakes)')
+    parser.add_argument('--model', choices=('closed', 'open'), default='closed', help='arrival model')
+    parser.add_argument('--users', type=int, default=20, help='concurrent customers (closed loop)')
+    parser.add_argument('--rate', type=float, default=50.0, help='flow arrivals per second (open loop)')
+    parser.add_argument('--max-in-flight', type=int, default=256, help='flows running at once (open loop)')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds to generate load for')
+    parser.add_argument('--think-ms', type=float, default=0.0, help='mean pause between turns')
+    parser.add_argument('--state', choices=('context', 'session'), default='context',
+                        help='carry the conversation as a context dict or a server-side session_id')
+    parser.add_argument('--db-latency-ms', type=float, default=0.5, help='fake MySQL round trip (in-process only)')
+    parser.add_argument('--llm-latency-ms', type=float, default=50.0, help='fake Gemini call (in-process only)')
+    parser.add_argument('--orders', type=int, default=1000, help='synthetic orders (in-process only)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    args = parser.parse_args()
+
+    url = args.url or start_local_server(args)
+    orders, processing = list(SAMPLE_ORDERS), list(SAMPLE_PROCESSING)
+    if not args.url:
+        # fakes.add_orders gives every fourth synthetic order the 'processing' status
+        orders += [str(20000 + i) for i in range(args.orders)]
+        processing += [str(20000 + i) for i in range(0, args.orders, 4)]
+
+    client = ChatClient(url)
+    results = Results()
+    print(f"Driving {url} ({args.model} loop, {args.duration:.0f}s)...")
+    start = time.perf_counter()
+    if args.model == 'closed':
+        closed_loop(client, results, args, orders, processing)
+    else:
+        open_loop(client, results, args, orders, processing)
+    elapsed = time.perf_counter() - start
+
+    flows = {}
+    for name in FLOWS:
+        if results.started[name]:
+            flows[name] = dict(summarize(results.latencies[name]), started=results.started[name],
+                               errors=results.errors[name],
+                               error_rate=round(results.errors[name] / results.started[name], 4))
+    started = sum(results.started.values())
+    errors = sum(results.errors.values())
+    overall = dict(summarize([v for values in results.latencies.values() for v in values]),
+                   started=started, errors=errors, error_rate=round(errors / started, 4) if started else 0.0,
+                   flows_per_sec=round(started / elapsed, 1), elapsed_s=round(elapsed, 3))
+
+    print(f"{started} flows in {elapsed:.1f}s ({overall['flows_per_sec']} flows/s), {errors} errors")
+    print(f"{'flow':<20}{'done':>7}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, summary in list(flows.items()) + [('overall', overall)]:
+        print(f"{name:<20}{summary['count']:>7}{summary['errors']:>8}"
+              f"{summary['p50_ms']:>10.1f}{summary['p95_ms']:>10.1f}{summary['p99_ms']:>10.1f}")
+    for kind, count in sorted(results.error_kinds.items(), key=lambda item: -item[1]):
+        print(f"  {count} x {kind}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({
+                'meta': {'benchmark': 'load_gen', 'commit': git_commit(), 'url': url, 'args': vars(args)},
+                'overall': overall,
+                'flows': flows,
+                'error_kinds': dict(results.error_kinds)
+            }, f, indent=2)
+        print(f"Results saved to {args.output}")
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
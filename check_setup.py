@@ -64,7 +64,8 @@ def check_pip_packages():
         'flask': 'Flask',
         'flask_cors': 'Flask-CORS',
         'mysql.connector': 'mysql-connector-python',
-        'google.generativeai': 'google-generativeai'
+        'google.generativeai': 'google-generativeai',
+        'numpy': 'numpy'
     }
     
     all_installed = True
@@ -0,0 +1,202 @@
+"""
+Asynchronous conversation logging for the E-commerce Support Chatbot
+Chat turns are appended to an in-memory ring buffer and written to the
+conversation_history table by a background flusher as multi-row INSERTs, so
+a chat request never waits on MySQL for analytics. When the buffer is full
+(MySQL slow or down) the oldest rows are either dropped or spilled to a
+JSON Lines file, and counters record how many rows took each path. A batch
+rejected because of one bad row (an unknown user_id, say) is written again
+row by row, so the other turns in it are not lost.
+"""
+
+import json
+import threading
+from collections import deque
+from datetime import datetime
+from mysql.connector import Error, IntegrityError, DataError
+
+INSERT_CONVERSATION = """
+    INSERT INTO conversation_history (user_id, user_message, bot_response, intent, conversation_state,
+                                      response_type, timestamp)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+"""
+
+COLUMNS = ('user_id', 'user_message', 'bot_response', 'intent', 'conversation_state', 'response_type', 'timestamp')
+
+OVERFLOW_POLICIES = ('drop', 'spill')
+
+
+class ConversationLogger:
+    """Ring buffer of chat turns flushed to MySQL in batches
+
+    capacity:        rows held in memory before the overflow policy applies
+    batch_size:      rows per multi-row INSERT; a full batch wakes the flusher early
+    flush_interval:  seconds between flushes of a partial batch
+    overflow:        'drop' to discard the oldest rows, 'spill' to append them to spill_path
+    spill_path:      JSON Lines file for spilled rows (one object per row)
+    """
+
+    def __init__(self, connection_factory, capacity=10000, batch_size=200, flush_interval=1.0,
+                 overflow='drop', spill_path=None):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"overflow must be one of {OVERFLOW_POLICIES}, got {overflow!r}")
+        if overflow == 'spill' and not spill_path:
+            raise ValueError("overflow='spill' needs a spill_path")
+
+        self.connection_factory = connection_factory
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.spill_path = spill_path
+
+        self._buffer = deque()
+        self._cond = threading.Condition()
+        self._spill_lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+
+        self.queued = 0
+        self.logged = 0
+        self.dropped = 0
+        self.spilled = 0
+        self.failed_batches = 0
+        self.retried_rows = 0
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._cond:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='conversation-log', daemon=True)
+                    self._thread.start()
+
+    def log(self, user_id, user_message, bot_response, intent, response_type, state=None):
+        """Queue one chat turn (never blocks on the database); state is the pending step that handled it"""
+        if self._closed:
+            return
+        self._ensure_started()
+
+        row = (user_id, user_message, bot_response, intent, state, response_type, datetime.now())
+        evicted = None
+        with self._cond:
+            if len(self._buffer) >= self.capacity:
+                evicted = self._buffer.popleft()
+            self._buffer.append(row)
+            self.queued += 1
+            if len(self._buffer) >= self.batch_size:
+                self._cond.notify()
+
+        if evicted is not None:
+            self._overflow([evicted])
+
+    def _overflow(self, rows):
+        """Apply the overflow policy to rows that cannot be written to MySQL"""
+        if self.overflow == 'spill':
+            try:
+                with self._spill_lock, open(self.spill_path, 'a', encoding='utf-8') as f:
+                    for row in rows:
+                        f.write(json.dumps(dict(zip(COLUMNS, row)), default=str) + '\n')
+                self.spilled += len(rows)
+                return
+            except OSError as e:
+                print(f"Error spilling conversation log to {self.spill_path}: {e}")
+        self.dropped += len(rows)
+
+    def _take_batch(self):
+        with self._cond:
+            count = min(self.batch_size, len(self._buffer))
+            return [self._buffer.popleft() for _ in range(count)]
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._closed or len(self._buffer) >= self.batch_size,
+                                    timeout=self.flush_interval)
+                closed = self._closed
+            batch = self._take_batch()
+            if batch:
+                self._write(batch)
+            if closed:
+                return
+
+    def _write(self, batch):
+        """Insert one batch in a single statement and commit"""
+        connection = self.connection_factory()
+        try:
+            if not connection:
+                raise Error("No database connection")
+            cursor = connection.cursor()
+            cursor.executemany(INSERT_CONVERSATION, batch)
+            connection.commit()
+            cursor.close()
+            self.logged += len(batch)
+        except (IntegrityError, DataError) as e:
+            print(f"Error writing conversation log batch, retrying row by row: {e}")
+            self.failed_batches += 1
+            connection.rollback()
+            self._write_rows(connection, batch)
+        except Error as e:
+            print(f"Error writing conversation log: {e}")
+            self.failed_batches += 1
+            self._overflow(batch)
+        finally:
+            if connection:
+                connection.close()
+
+    def _write_rows(self, connection, rows):
+        """Insert rows one at a time; a row still rejected is retried once without its user_id"""
+        rejected = []
+        try:
+            cursor = connection.cursor()
+            for row in rows:
+                for attempt in (row, (None,) + row[1:]):
+                    try:
+                        cursor.execute(INSERT_CONVERSATION, attempt)
+                        break
+                    except (IntegrityError, DataError):
+                        continue
+                else:
+                    rejected.append(row)
+            connection.commit()
+            cursor.close()
+        except Error as e:
+            print(f"Error writing conversation log: {e}")
+            self._overflow(rows)  # nothing was committed
+            return
+        self.logged += len(rows) - len(rejected)
+        self.retried_rows += len(rows)
+        if rejected:
+            self._overflow(rejected)
+
+    def flush(self):
+        """Write everything buffered now, from the calling thread"""
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                return
+            self._write(batch)
+
+    def close(self, timeout=10.0):
+        """Stop the flusher and write whatever is still buffered"""
+        if self._closed:
+            return
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.flush()
+
+    def stats(self):
+        """Buffer depth and logged/dropped/spilled counters"""
+        return {
+            'buffered': len(self._buffer),
+            'capacity': self.capacity,
+            'overflow': self.overflow,
+            'queued': self.queued,
+            'logged': self.logged,
+            'dropped': self.dropped,
+            'spilled': self.spilled,
+            'failed_batches': self.failed_batches,
+            'retried_rows': self.retried_rows
+        }
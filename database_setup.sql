@@ -27,7 +27,8 @@ CREATE TABLE IF NOT EXISTS orders (
     tracking_number VARCHAR(50),
     FOREIGN KEY (user_id) REFERENCES users(user_id),
     INDEX idx_user_id (user_id),
-    INDEX idx_status (status)
+    INDEX idx_status (status),
+    INDEX idx_order_date (order_date)
 );
 
 -- Create tickets table
@@ -44,13 +45,14 @@ CREATE TABLE IF NOT EXISTS tickets (
     INDEX idx_status (status)
 );
 
--- Create conversation_history table (optional - for tracking chats)
+-- Create conversation_history table (filled in batches by conversation_log.py)
 CREATE TABLE IF NOT EXISTS conversation_history (
     conversation_id INT AUTO_INCREMENT PRIMARY KEY,
     user_id INT,
     user_message TEXT NOT NULL,
     bot_response TEXT NOT NULL,
     intent VARCHAR(50),
+    conversation_state VARCHAR(50),
     response_type VARCHAR(50),
     timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (user_id) REFERENCES users(user_id),
@@ -58,6 +60,14 @@ CREATE TABLE IF NOT EXISTS conversation_history (
     INDEX idx_timestamp (timestamp)
 );
 
+-- Create chat_sessions table (server-side conversation context, SESSION_BACKEND=mysql)
+CREATE TABLE IF NOT EXISTS chat_sessions (
+    session_id VARCHAR(64) PRIMARY KEY,
+    context TEXT NOT NULL,
+    expires_at DATETIME NOT NULL,
+    INDEX idx_expires_at (expires_at)
+);
+
 -- Insert sample users
 INSERT INTO users (name, email, phone) VALUES
 ('John Doe', 'john@example.com', '+1-555-0101'),
@@ -0,0 +1,180 @@
+"""
+MySQL connection pool for the E-commerce Support Chatbot
+Keeps a bounded set of open connections so that each query borrows an
+existing connection instead of paying for a new TCP + auth handshake.
+"""
+
+import threading
+import time
+import mysql.connector
+from mysql.connector import Error
+
+
+class PoolTimeoutError(Error):
+    """Raised when no connection becomes available within the checkout timeout"""
+
+
+class PooledConnection:
+    """Wrapper around a MySQL connection whose close() hands it back to the pool"""
+
+    def __init__(self, pool, connection):
+        self._pool = pool
+        self._connection = connection
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self._checked_out = False
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    def close(self):
+        """Return the connection to the pool"""
+        if self._checked_out:
+            self._checked_out = False
+            self._pool._release(self)
+
+    def _close_raw(self):
+        """Really close the underlying connection"""
+        try:
+            self._connection.close()
+        except Error:
+            pass
+
+
+class ConnectionPool:
+    """Thread-safe pool of MySQL connections with health checks and recycling
+
+    size:               maximum number of open connections
+    timeout:            seconds to wait for a free connection before giving up
+    recycle:            seconds after which a connection is closed and reopened
+    health_check_idle:  ping connections that sat idle longer than this (0 = always)
+    """
+
+    def __init__(self, config, size=5, timeout=5.0, recycle=1800, health_check_idle=30):
+        self.config = config
+        self.size = size
+        self.timeout = timeout
+        self.recycle = recycle
+        self.health_check_idle = health_check_idle
+
+        self._idle = []
+        self._open = 0
+        self._in_use = 0
+        self._cond = threading.Condition()
+
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._max_wait = 0.0
+        self._timeouts = 0
+        self._recycled = 0
+        self._health_check_failures = 0
+
+    def _connect(self):
+        return PooledConnection(self, mysql.connector.connect(**self.config))
+
+    def _is_usable(self, conn, now):
+        """Decide whether an idle connection can be handed out again"""
+        if self.recycle and now - conn.created_at > self.recycle:
+            self._recycled += 1
+            return False
+
+        if now - conn.last_used >= self.health_check_idle:
+            try:
+                conn._connection.ping(reconnect=False)
+            except Error:
+                self._health_check_failures += 1
+                return False
+
+        return True
+
+    def get_connection(self):
+        """Borrow a connection, waiting up to `timeout` seconds for one to free up"""
+        start = time.monotonic()
+        deadline = start + self.timeout
+        waited = False
+
+        with self._cond:
+            while not self._idle and self._open >= self.size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeoutError(f"No database connection available after {self.timeout}s")
+                waited = True
+                self._cond.wait(remaining)
+
+            conn = self._idle.pop() if self._idle else None
+            self._open += 0 if conn else 1
+            self._in_use += 1
+
+        # Health checks and new connections happen outside the lock
+        try:
+            if conn is not None and not self._is_usable(conn, time.monotonic()):
+                conn._close_raw()
+                conn = None
+            if conn is None:
+                conn = self._connect()
+        except Error:
+            with self._cond:
+                self._open -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+        wait = time.monotonic() - start
+        with self._cond:
+            self._checkouts += 1
+            if waited:
+                self._waits += 1
+            self._wait_time += wait
+            self._max_wait = max(self._max_wait, wait)
+
+        conn._checked_out = True
+        return conn
+
+    def _release(self, conn):
+        """Put a connection back into the idle list"""
+        healthy = True
+        try:
+            # Drop any open read snapshot so the next borrower sees fresh data
+            if conn._connection.in_transaction:
+                conn._connection.rollback()
+        except Error:
+            healthy = False
+
+        conn.last_used = time.monotonic()
+        if not healthy:
+            conn._close_raw()
+
+        with self._cond:
+            self._in_use -= 1
+            if healthy:
+                self._idle.append(conn)
+            else:
+                self._open -= 1
+            self._cond.notify()
+
+    def close_all(self):
+        """Close every idle connection (connections in use are closed on release)"""
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+        for conn in idle:
+            conn._close_raw()
+
+    def stats(self):
+        """Snapshot of pool usage counters"""
+        with self._cond:
+            return {
+                'size': self.size,
+                'open': self._open,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'checkouts': self._checkouts,
+                'waits': self._waits,
+                'timeouts': self._timeouts,
+                'avg_wait_ms': round(self._wait_time / self._checkouts * 1000, 3) if self._checkouts else 0.0,
+                'max_wait_ms': round(self._max_wait * 1000, 3),
+                'recycled': self._recycled,
+                'health_check_failures': self._health_check_failures
+            }
@@ -0,0 +1,98 @@
+"""
+Intent classification for the E-commerce Support Chatbot
+Keyword groups are precompiled module-level tuples checked in precedence
+order with short-circuiting, and order numbers are extracted by the same
+call, so chat() classifies a message and finds its order numbers at once.
+"""
+
+import re
+
+ORDER_NUMBER_PATTERN = re.compile(r'\b\d{5}\b')
+
+RETURN_WORDS = ('return', 'refund', 'send back')
+TRACK_WORDS = ('track', 'status', 'where is', 'where\'s', 'delivery', 'order')
+TRACK_EXCLUDE_WORDS = ('return', 'refund', 'cancel')
+SHIPPING_WORDS = ('shipping', 'ship', 'delivery options', 'how long')
+SHIPPING_EXCLUDE_WORDS = ('track', 'where')
+PAYMENT_WORDS = ('payment', 'pay', 'card', 'upi', 'paytm')
+CANCEL_WORDS = ('cancel', 'stop order')
+ADDRESS_CHANGE_WORDS = ('change', 'update', 'modify')
+SUPPORT_WORDS = ('contact', 'support', 'help', 'speak to', 'talk to', 'agent')
+
+# Replies accepted as "yes" to the follow-up questions
+CANCEL_CONFIRM_WORDS = ('yes', 'sure', 'please', 'ok', 'yeah', 'yep', 'cancel')
+ADDRESS_CONFIRM_WORDS = ('yes', 'sure', 'please', 'ok', 'yeah', 'yep', 'confirm')
+
+
+def contains_any(text, words):
+    """True if any of words is a substring of text (stops at the first hit)"""
+    for word in words:
+        if word in text:
+            return True
+    return False
+
+
+def is_standalone_order_number(query):
+    """Check if message is just an order number"""
+    query_stripped = query.strip()
+    return query_stripped.isdigit() and len(query_stripped) == 5
+
+
+def classify_message(query, context):
+    """Detect intent and extract order numbers in one call
+
+    Returns (intent, order numbers). The first order number is the one the
+    single-order flows act on.
+    """
+    # Check if it's a standalone order number
+    if is_standalone_order_number(query):
+        numbers = [query.strip()]
+        # Context determines what to do with the order number
+        if context.get('awaiting_return_order_number'):
+            return 'return_item_with_order', numbers
+        elif context.get('awaiting_order_for_cancel'):
+            return 'cancel_order_with_number', numbers
+        elif context.get('awaiting_order_for_address'):
+            return 'change_address_with_number', numbers
+        else:
+            # Default: treat as tracking request
+            return 'track_order', numbers
+
+    query_lower = query.lower()
+    numbers = ORDER_NUMBER_PATTERN.findall(query)
+    has_order_number = bool(numbers)
+
+    # Return/Refund intent
+    if contains_any(query_lower, RETURN_WORDS):
+        return ('return_item_with_order' if has_order_number else 'return_item'), numbers
+
+    # Order tracking
+    if contains_any(query_lower, TRACK_WORDS) and not contains_any(query_lower, TRACK_EXCLUDE_WORDS):
+        return 'track_order', numbers
+
+    # Shipping
+    if (contains_any(query_lower, SHIPPING_WORDS) and not has_order_number
+            and not contains_any(query_lower, SHIPPING_EXCLUDE_WORDS)):
+        return 'shipping_info', numbers
+
+    # Payment
+    if contains_any(query_lower, PAYMENT_WORDS):
+        return 'payment_info', numbers
+
+    # Cancel
+    if contains_any(query_lower, CANCEL_WORDS):
+        return 'cancel_order', numbers
+
+    # Address change
+    if 'address' in query_lower and contains_any(query_lower, ADDRESS_CHANGE_WORDS):
+        return 'change_address', numbers
+
+    # Contact/Support
+    if contains_any(query_lower, SUPPORT_WORDS):
+        return 'contact_support', numbers
+
+    # Several order numbers and nothing else recognised ("where are 12345 and 12348?")
+    if len(set(numbers)) > 1:
+        return 'track_order', numbers
+
+    return 'general', numbers
@@ -0,0 +1,95 @@
+"""
+JSON encoding for the E-commerce Support Chatbot
+A Flask JSON provider that serializes with orjson when it is installed and
+with the standard library otherwise, plus helpers that turn MySQL rows into
+plain JSON types (ISO 8601 strings for dates, floats for DECIMAL amounts)
+once, when the row is fetched, instead of on every response.
+"""
+
+from datetime import date, time as dt_time, timedelta
+from decimal import Decimal
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+BACKENDS = ('auto', 'orjson', 'json')
+
+
+def plain_value(value):
+    """A DB column value as a JSON-native type"""
+    if isinstance(value, (date, dt_time)):  # datetime is a date
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, timedelta):  # MySQL TIME columns
+        return value.total_seconds()
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode('utf-8', errors='replace')
+    return value
+
+
+def plain_row(row):
+    """A dictionary-cursor row with every value converted by plain_value (None stays None)"""
+    if row is None:
+        return None
+    return {column: plain_value(value) for column, value in row.items()}
+
+
+def resolve_backend(name):
+    """'orjson' or 'json' for a JSON_BACKEND setting"""
+    if name not in BACKENDS:
+        print(f"Error: unknown JSON backend {name!r}, expected one of {', '.join(BACKENDS)}")
+        name = 'auto'
+    if name == 'json':
+        return 'json'
+    if orjson is None:
+        if name == 'orjson':
+            print("Error: orjson is not installed, using the standard json module")
+        return 'json'
+    return 'orjson'
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask's default JSON provider, serializing with orjson when available
+
+    backend:  'auto' (orjson if installed), 'orjson' or 'json'
+
+    Output decodes to the same values as DefaultJSONProvider (sorted keys,
+    HTTP dates, Decimal as a string); only whitespace differs, and non-ASCII
+    text is written as UTF-8 rather than \\u escapes. Pretty-printed output
+    (debug mode) and values orjson rejects go through the standard library.
+    """
+
+    def __init__(self, app, backend='auto'):
+        super().__init__(app)
+        self.backend = resolve_backend(backend)
+        self.fallbacks = 0
+        if self.backend == 'orjson':
+            # Datetimes go through default() so they are formatted exactly as Flask formats them
+            self._options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+            if self.sort_keys:
+                self._options |= orjson.OPT_SORT_KEYS
+
+    def dumps_bytes(self, obj):
+        """Serialize obj to UTF-8 JSON bytes"""
+        if self.backend == 'orjson':
+            try:
+                return orjson.dumps(obj, default=self.default, option=self._options)
+            except TypeError:
+                self.fallbacks += 1  # e.g. integers beyond 64 bits; the standard library decides
+        return super().dumps(obj).encode('utf-8')
+
+    def dumps(self, obj, **kwargs):
+        # response() asks for compact separators, which is what orjson writes anyway
+        if self.backend == 'orjson' and kwargs.keys() <= {'separators'} and kwargs.get('separators', (',', ':')) == (',', ':'):
+            return self.dumps_bytes(obj).decode('utf-8')
+        return super().dumps(obj, **kwargs)
+
+    def stats(self):
+        return {
+            'backend': self.backend,
+            'fallbacks': self.fallbacks
+        }
@@ -0,0 +1,211 @@
+"""
+Knowledge base retrieval for the E-commerce Support Chatbot
+Articles are tokenized once into an inverted index (token -> postings) and
+queries are ranked with BM25, so lookups only touch articles that share a
+term with the query instead of scanning the whole knowledge base. An article
+matched through its key terms ("return", "shipping", ...) is always a
+candidate; one matched only through body words must score at least
+body_min_score, so a question that merely shares a common word with an
+article still goes to Gemini.
+"""
+
+import json
+import math
+import os
+import re
+import threading
+import time
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset("""
+a about after all also am an and any are as at be been before being but by can could did do
+does doing for from get got had has have how i if in into is it its just me my of on or our
+please so some than that the their them then there these they this to too us was we were what
+when which while who why will with would you your
+again ask he her here hers him his hello hey hi know like many may might more most much must need no
+nor not now off ok okay one only other out over she should tell thank thanks up very want where yes
+""".split())
+
+
+def _undouble(token):
+    """'shipp' -> 'ship', 'stopp' -> 'stop'"""
+    if len(token) > 2 and token[-1] == token[-2] and token[-1] not in 'aeioulsz':
+        return token[:-1]
+    return token
+
+
+def stem(token):
+    """Very small suffix stripper so that 'returns'/'returned'/'returning' share a term"""
+    if len(token) > 5 and token.endswith('ing'):
+        return _undouble(token[:-3])
+    if len(token) > 4 and token.endswith('ed'):
+        return _undouble(token[:-2])
+    if len(token) > 4 and token.endswith('es') and token[-3] in 'sxz':
+        return token[:-2]
+    if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+        return token[:-1]
+    return token
+
+
+def tokenize(text):
+    """Lowercase, split on non-alphanumerics, drop stopwords and bare numbers, and stem"""
+    return [stem(tok) for tok in TOKEN_PATTERN.findall(text.lower())
+            if tok not in STOPWORDS and not tok.isdigit()]
+
+
+class KnowledgeBaseIndex:
+    """BM25-ranked inverted index over knowledge base articles
+
+    seed:             dict of article key -> text, always part of the index
+    path:             optional JSON file ({key: text}) merged over the seed and hot-reloaded
+    title_boost:      weight of article-key tokens relative to body tokens
+    body_min_score:   minimum BM25 score of an article none of whose key terms are in the query
+    reload_interval:  seconds between checks of the file's modification time
+    """
+
+    def __init__(self, seed, path=None, k1=1.5, b=0.75, title_boost=3, body_min_score=3.0, reload_interval=5):
+        self.seed = dict(seed)
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.title_boost = title_boost
+        self.body_min_score = body_min_score
+        self.reload_interval = reload_interval
+
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._last_check = 0.0
+        self.reloads = 0
+
+        self._state = self._build(self._load_articles())
+
+    def _load_articles(self):
+        """Seed articles overlaid with the ones from `path`, if any"""
+        articles = dict(self.seed)
+        if self.path and os.path.exists(self.path):
+            try:
+                self._mtime = os.path.getmtime(self.path)
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    articles.update(json.load(f))
+            except (OSError, ValueError) as e:
+                print(f"Error loading knowledge base file {self.path}: {e}")
+        return articles
+
+    def _build(self, articles):
+        """Build the immutable index state for a set of articles"""
+        keys = list(articles)
+        texts = [articles[key] for key in keys]
+        postings = {}
+        lengths = []
+        titles = []
+
+        for doc_id, (key, text) in enumerate(zip(keys, texts)):
+            weights = {}
+            title_tokens = tokenize(key.replace('_', ' '))
+            titles.append(frozenset(title_tokens))
+            body_tokens = tokenize(text)
+            for tok in title_tokens:
+                weights[tok] = weights.get(tok, 0) + self.title_boost
+            for tok in body_tokens:
+                weights[tok] = weights.get(tok, 0) + 1
+            for tok, weight in weights.items():
+                postings.setdefault(tok, []).append((doc_id, weight))
+            lengths.append(len(title_tokens) * self.title_boost + len(body_tokens))
+
+        num_docs = len(keys)
+        avg_len = (sum(lengths) / num_docs) if num_docs else 1.0
+        # Length normalisation is per-document, so it is computed once here
+        norms = [self.k1 * (1 - self.b + self.b * length / avg_len) for length in lengths]
+        idf = {
+            tok: math.log(1 + (num_docs - len(plist) + 0.5) / (len(plist) + 0.5))
+            for tok, plist in postings.items()
+        }
+
+        return {
+            'articles': articles,
+            'keys': keys,
+            'texts': texts,
+            'postings': postings,
+            'titles': titles,
+            'norms': norms,
+            'idf': idf
+        }
+
+    def reload_if_changed(self):
+        """Rebuild the index if the backing file changed since the last load"""
+        if not self.path:
+            return False
+
+        now = time.monotonic()
+        if now - self._last_check < self.reload_interval:
+            return False
+        self._last_check = now
+
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            mtime = None
+        if mtime == self._mtime:
+            return False
+
+        with self._lock:
+            self._state = self._build(self._load_articles())
+            self._mtime = mtime
+            self.reloads += 1
+        return True
+
+    def search(self, query, top_k=3, min_score=0.0, relative_cutoff=0.5):
+        """Return up to top_k (key, text, score) tuples, best first
+
+        Articles sharing no key term with the query need `body_min_score`;
+        a single common body word is not evidence. Results scoring below
+        `min_score`, or below `relative_cutoff` x the best score, are dropped
+        so that weakly related articles are not appended to a strong match.
+        On equal scores an article matched by its key terms ranks first.
+        """
+        self.reload_if_changed()
+        state = self._state
+        postings = state['postings']
+        titles = state['titles']
+        idf = state['idf']
+        norms = state['norms']
+        k1 = self.k1
+
+        query_tokens = set(tokenize(query))
+        scores = {}
+        for tok in query_tokens:
+            plist = postings.get(tok)
+            if not plist:
+                continue
+            tok_idf = idf[tok]
+            for doc_id, tf in plist:
+                scores[doc_id] = scores.get(doc_id, 0.0) + tok_idf * tf * (k1 + 1) / (tf + norms[doc_id])
+
+        titled = {doc_id for doc_id in scores if titles[doc_id] & query_tokens}
+        scores = {doc_id: score for doc_id, score in scores.items()
+                  if doc_id in titled or score >= self.body_min_score}
+        if not scores:
+            return []
+
+        ranked = sorted(scores.items(), key=lambda item: (item[1], item[0] in titled), reverse=True)[:top_k]
+        threshold = max(min_score, ranked[0][1] * relative_cutoff)
+        return [
+            (state['keys'][doc_id], state['texts'][doc_id], score)
+            for doc_id, score in ranked
+            if score >= threshold
+        ]
+
+    def get(self, key, default=None):
+        """Return the current text of an article by key"""
+        return self._state['articles'].get(key, default)
+
+    def stats(self):
+        """Size of the index"""
+        state = self._state
+        return {
+            'articles': len(state['keys']),
+            'terms': len(state['postings']),
+            'path': self.path,
+            'reloads': self.reloads
+        }
@@ -0,0 +1,138 @@
+"""
+Response cache for Gemini answers in the E-commerce Support Chatbot
+Answers are keyed on the normalized customer question plus a hash of the
+database / knowledge base payload the prompt was built from. A bounded
+in-memory tier serves repeats in microseconds; an optional SQLite tier keeps
+answers across restarts.
+"""
+
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from cache import TTLCache
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(query):
+    """Lowercase, drop punctuation and collapse whitespace"""
+    return _WHITESPACE.sub(' ', _PUNCTUATION.sub('', query.lower())).strip()
+
+
+def payload_hash(db_info=None, kb_info=None):
+    """Stable short hash of the data a prompt was built from"""
+    if not db_info and not kb_info:
+        return ''
+    payload = json.dumps([db_info, kb_info], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+class LLMResponseCache:
+    """Two-tier (memory, optional SQLite) cache of generated responses
+
+    max_size:  entries kept in memory
+    ttl:       seconds a response stays valid in either tier
+    db_path:   SQLite file for the persistent tier, None to disable it
+    """
+
+    def __init__(self, max_size=2048, ttl=3600, db_path=None):
+        self.ttl = ttl
+        self.memory = TTLCache(max_size=max_size, ttl=ttl)
+        self.db_path = db_path
+        self._db = None
+        self._db_lock = threading.Lock()
+        self.disk_hits = 0
+        self.disk_misses = 0
+        self.stores = 0
+
+        if db_path:
+            try:
+                self._db = sqlite3.connect(db_path, check_same_thread=False)
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS llm_responses ("
+                    " cache_key TEXT PRIMARY KEY,"
+                    " response TEXT NOT NULL,"
+                    " expires_at REAL NOT NULL)"
+                )
+                self._db.execute("DELETE FROM llm_responses WHERE expires_at <= ?", (time.time(),))
+                self._db.commit()
+            except sqlite3.Error as e:
+                print(f"Error opening LLM cache database {db_path}: {e}")
+                self._db = None
+
+    @staticmethod
+    def make_key(query, db_info=None, kb_info=None):
+        """Cache key for a question and the data its prompt includes"""
+        return f"{normalize_query(query)}|{payload_hash(db_info, kb_info)}"
+
+    def get(self, key):
+        """Return the cached response for key, or None"""
+        response = self.memory.get(key)
+        if response is not None or self._db is None:
+            return response
+
+        with self._db_lock:
+            try:
+                row = self._db.execute(
+                    "SELECT response, expires_at FROM llm_responses WHERE cache_key = ?", (key,)
+                ).fetchone()
+            except sqlite3.Error as e:
+                print(f"Error reading LLM cache: {e}")
+                row = None
+
+        # Stored expiry is wall-clock time so that it survives restarts
+        remaining = row[1] - time.time() if row else 0
+        if remaining <= 0:
+            self.disk_misses += 1
+            return None
+
+        self.disk_hits += 1
+        self.memory.set(key, row[0], ttl=remaining)
+        return row[0]
+
+    def set(self, key, response):
+        """Store a response in every tier"""
+        self.memory.set(key, response)
+        self.stores += 1
+        if self._db is None:
+            return
+
+        with self._db_lock:
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO llm_responses (cache_key, response, expires_at) VALUES (?, ?, ?)",
+                    (key, response, time.time() + self.ttl)
+                )
+                self._db.commit()
+            except sqlite3.Error as e:
+                print(f"Error writing LLM cache: {e}")
+
+    def purge_expired(self):
+        """Delete expired rows from the persistent tier"""
+        if self._db is None:
+            return 0
+        with self._db_lock:
+            cursor = self._db.execute("DELETE FROM llm_responses WHERE expires_at <= ?", (time.time(),))
+            self._db.commit()
+            return cursor.rowcount
+
+    def stats(self):
+        """Hit rates for each tier"""
+        memory = self.memory.stats()
+        lookups = memory['hits'] + memory['misses']
+        hits = memory['hits'] + self.disk_hits
+        return {
+            'memory': memory,
+            'disk': {
+                'enabled': self._db is not None,
+                'path': self.db_path,
+                'hits': self.disk_hits,
+                'misses': self.disk_misses
+            },
+            'stores': self.stores,
+            'hit_rate': round(hits / lookups, 4) if lookups else 0.0
+        }
@@ -0,0 +1,344 @@
+"""
+Guarded Gemini calls for the E-commerce Support Chatbot
+Caps how many model calls run at once, gives each call a deadline, and
+trips a circuit breaker when too many recent calls failed, so a slow or
+failing upstream model costs callers at most max_wait + timeout seconds
+(nothing at all while the circuit is open) instead of tying up every worker.
+Works with any callable, so a local fake model can stand in for Gemini.
+"""
+
+import asyncio
+import functools
+import threading
+import time
+import weakref
+from collections import deque, defaultdict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+_END = object()
+
+
+class LLMUnavailable(Exception):
+    """The model was not called: the circuit is open or no slot freed up in time"""
+
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class LLMTimeout(Exception):
+    """The model did not answer before the deadline"""
+
+
+class CircuitBreaker:
+    """Rolling error-rate circuit breaker
+
+    error_threshold:  share of failed calls in the window that opens the circuit
+    window:           seconds of call outcomes considered
+    min_calls:        outcomes needed in the window before the circuit can open
+    cooldown:         seconds the circuit stays open before a single probe call is let through
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, error_threshold=0.5, window=30.0, min_calls=10, cooldown=15.0):
+        self.error_threshold = error_threshold
+        self.window = window
+        self.min_calls = min_calls
+        self.cooldown = cooldown
+
+        self.state = self.CLOSED
+        self._outcomes = deque()  # (monotonic time, succeeded)
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+        self.opens = 0
+
+    def _trim(self, now):
+        while self._outcomes and now - self._outcomes[0][0] > self.window:
+            _, succeeded = self._outcomes.popleft()
+            if not succeeded:
+                self._failures -= 1
+
+    def _open(self, now):
+        self.state = self.OPEN
+        self._opened_at = now
+        self.opens += 1
+
+    def allow(self):
+        """True if a call may go ahead"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.cooldown:
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record(self, succeeded):
+        """Record the outcome of an allowed call"""
+        now = time.monotonic()
+        with self._lock:
+            if self.state == self.HALF_OPEN and self._probing:
+                self._probing = False
+                if succeeded:
+                    self.state = self.CLOSED
+                    self._outcomes.clear()
+                    self._failures = 0
+                else:
+                    self._open(now)
+                return
+
+            self._outcomes.append((now, succeeded))
+            if not succeeded:
+                self._failures += 1
+            self._trim(now)
+            if (self.state == self.CLOSED and len(self._outcomes) >= self.min_calls
+                    and self._failures / len(self._outcomes) >= self.error_threshold):
+                self._open(now)
+
+    def cancel(self):
+        """An allowed call never reached the model; let another probe through"""
+        with self._lock:
+            self._probing = False
+
+    def stats(self):
+        with self._lock:
+            self._trim(time.monotonic())
+            calls = len(self._outcomes)
+            return {
+                'state': self.state,
+                'calls_in_window': calls,
+                'error_rate': round(self._failures / calls, 3) if calls else 0.0,
+                'opens': self.opens
+            }
+
+
+class LLMGuard:
+    """Concurrency cap, per-call deadline and circuit breaker around model calls
+
+    max_in_flight:  model calls allowed to run at once (blocking calls run on this many worker threads)
+    max_wait:       seconds a call waits for a free slot before failing with LLMUnavailable('busy')
+    timeout:        seconds a call (a whole stream, when streaming) may take before LLMTimeout
+    breaker:        CircuitBreaker deciding whether to call the model at all
+    on_wait:        called with the seconds each call waited for a slot
+    on_trip:        called with 'circuit_open', 'busy' or 'timeout' when the guard stops a call
+
+    A blocking call that times out keeps its slot until the model finally
+    returns, so a hung upstream cannot push more than max_in_flight calls at it.
+    Coroutine calls (acall/astream) are capped at max_in_flight per event loop.
+    """
+
+    def __init__(self, max_in_flight=16, max_wait=2.0, timeout=20.0, breaker=None, on_wait=None, on_trip=None):
+        self.max_in_flight = max_in_flight
+        self.max_wait = max_wait
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker()
+        self.on_wait = on_wait
+        self.on_trip = on_trip
+
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix='llm-call')
+        self._loop_slots = weakref.WeakKeyDictionary()  # event loop -> asyncio.Semaphore
+        self._lock = threading.Lock()
+
+        self.in_flight = 0
+        self.calls = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.trips = defaultdict(int)
+
+    def _trip(self, reason):
+        self.trips[reason] += 1
+        if self.on_trip:
+            self.on_trip(reason)
+
+    def _waited(self, start):
+        if self.on_wait:
+            self.on_wait(time.perf_counter() - start)
+
+    def _admit(self):
+        if not self.breaker.allow():
+            self._trip('circuit_open')
+            raise LLMUnavailable('circuit_open')
+        start = time.perf_counter()
+        acquired = self._slots.acquire(timeout=self.max_wait)
+        self._waited(start)
+        if not acquired:
+            self.breaker.cancel()
+            self._trip('busy')
+            raise LLMUnavailable('busy')
+        with self._lock:
+            self.in_flight += 1
+            self.calls += 1
+
+    def _release(self, _future=None):
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    def _run(self, fn, deadline):
+        """Run fn on a worker thread and wait for it until the deadline"""
+        future = self._executor.submit(fn)
+        try:
+            return future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FutureTimeoutError:  # the builtin TimeoutError only from Python 3.11
+            if future.done():
+                return future.result()  # finished just now, or fn raised TimeoutError itself
+            future.add_done_callback(self._release)
+            raise LLMTimeout(f"no answer within {self.timeout}s")
+
+    def _finish(self, succeeded, exc=None):
+        self.breaker.record(succeeded)
+        with self._lock:
+            if succeeded:
+                self.succeeded += 1
+            else:
+                self.failed += 1
+        if isinstance(exc, LLMTimeout):
+            self._trip('timeout')
+
+    def call(self, fn, *args, **kwargs):
+        """Call a blocking model function under the guard"""
+        self._admit()
+        release = True
+        try:
+            result = self._run(functools.partial(fn, *args, **kwargs), time.monotonic() + self.timeout)
+        except LLMTimeout as e:
+            release = False  # the worker releases the slot when the call returns
+            self._finish(False, e)
+            raise
+        except Exception as e:
+            self._finish(False, e)
+            raise
+        finally:
+            if release:
+                self._release()
+        self._finish(True)
+        return result
+
+    def stream(self, fn, *args, **kwargs):
+        """Generator version of call() for a blocking function returning an iterable of chunks"""
+        self._admit()
+        deadline = time.monotonic() + self.timeout
+        release = True
+        try:
+            chunks = self._run(lambda: iter(fn(*args, **kwargs)), deadline)
+            while True:
+                chunk = self._run(functools.partial(next, chunks, _END), deadline)
+                if chunk is _END:
+                    break
+                yield chunk
+        except GeneratorExit:
+            self.breaker.cancel()  # the caller stopped reading; not the model's fault
+            raise
+        except LLMTimeout as e:
+            release = False
+            self._finish(False, e)
+            raise
+        except Exception as e:
+            self._finish(False, e)
+            raise
+        else:
+            self._finish(True)
+        finally:
+            if release:
+                self._release()
+
+    def _async_slots(self):
+        """The max_in_flight asyncio semaphore of the running event loop"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            slots = self._loop_slots.get(loop)
+            if slots is None:
+                slots = self._loop_slots[loop] = asyncio.Semaphore(self.max_in_flight)
+        return slots
+
+    async def _admit_async(self, semaphore):
+        if not self.breaker.allow():
+            self._trip('circuit_open')
+            raise LLMUnavailable('circuit_open')
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(semaphore.acquire(), self.max_wait)
+        except asyncio.TimeoutError:
+            self.breaker.cancel()
+            self._trip('busy')
+            raise LLMUnavailable('busy')
+        finally:
+            self._waited(start)
+        with self._lock:
+            self.in_flight += 1
+            self.calls += 1
+
+    def _release_async(self, semaphore):
+        with self._lock:
+            self.in_flight -= 1
+        semaphore.release()
+
+    async def acall(self, fn, *args, **kwargs):
+        """Awaitable call() for a coroutine function"""
+        semaphore = self._async_slots()
+        await self._admit_async(semaphore)
+        try:
+            result = await asyncio.wait_for(fn(*args, **kwargs), self.timeout)
+        except asyncio.TimeoutError:
+            error = LLMTimeout(f"no answer within {self.timeout}s")
+            self._finish(False, error)
+            raise error
+        except asyncio.CancelledError:
+            self.breaker.cancel()
+            raise
+        except Exception as e:
+            self._finish(False, e)
+            raise
+        finally:
+            self._release_async(semaphore)
+        self._finish(True)
+        return result
+
+    async def astream(self, fn, *args, **kwargs):
+        """Async generator version of stream() for a coroutine function returning an async iterator"""
+        semaphore = self._async_slots()
+        await self._admit_async(semaphore)
+        deadline = time.monotonic() + self.timeout
+        try:
+            chunks = await asyncio.wait_for(fn(*args, **kwargs), self.timeout)
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), max(0.0, deadline - time.monotonic()))
+                except StopAsyncIteration:
+                    break
+                yield chunk
+        except (GeneratorExit, asyncio.CancelledError):
+            self.breaker.cancel()
+            raise
+        except asyncio.TimeoutError:
+            error = LLMTimeout(f"no answer within {self.timeout}s")
+            self._finish(False, error)
+            raise error
+        except Exception as e:
+            self._finish(False, e)
+            raise
+        else:
+            self._finish(True)
+        finally:
+            self._release_async(semaphore)
+
+    def stats(self):
+        """Slots in use, call outcomes, trips and breaker state"""
+        return {
+            'max_in_flight': self.max_in_flight,
+            'in_flight': self.in_flight,
+            'calls': self.calls,
+            'succeeded': self.succeeded,
+            'failed': self.failed,
+            'trips': dict(self.trips),
+            'breaker': self.breaker.stats()
+        }
@@ -0,0 +1,165 @@
+"""
+Lightweight metrics for the E-commerce Support Chatbot
+Counters and fixed-bucket histograms kept in plain dicts behind a lock, and
+rendered in the Prometheus text exposition format for /metrics. Recording a
+sample is a bisect plus a few additions (about a microsecond), so it is
+cheap enough for every stage of every request.
+"""
+
+import functools
+import threading
+import time
+from bisect import bisect_left
+
+# Seconds; covers cache hits (sub-millisecond) up to slow Gemini calls
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+                   2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter with optional labels"""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+    def samples(self):
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in values:
+            yield self.name, _format_labels(self.labelnames, labels), value
+
+
+class Histogram:
+    """Fixed-bucket histogram with optional labels"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (last one is +Inf), sum, count]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def time(self, *labels):
+        """Decorator recording how long each call of the function takes"""
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.observe(time.perf_counter() - start, *labels)
+            return wrapper
+        return decorator
+
+    def count(self, *labels):
+        series = self._series.get(labels)
+        return series[2] if series else 0
+
+    def samples(self):
+        with self._lock:
+            series = [(labels, list(counts), total, count) for labels, (counts, total, count) in self._series.items()]
+        for labels, counts, total, count in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                yield (self.name + '_bucket',
+                       _format_labels(self.labelnames, labels, ('le', _format_value(bound))), cumulative)
+            yield self.name + '_sum', _format_labels(self.labelnames, labels), total
+            yield self.name + '_count', _format_labels(self.labelnames, labels), count
+
+
+class Registry:
+    """Collection of metrics rendered together"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        """Text exposition format (text/plain; version=0.0.4)"""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+registry = Registry()
+
+STAGE_SECONDS = registry.histogram(
+    'chatbot_stage_seconds', 'Time spent in each stage of a chat turn', ('stage',))
+TURN_SECONDS = registry.histogram(
+    'chatbot_turn_seconds', 'Chat turn handling time by intent, pending conversation state and response type',
+    ('intent', 'state', 'type'))
+DB_ERRORS = registry.counter(
+    'chatbot_db_errors_total', 'MySQL errors by operation', ('operation',))
+LLM_FALLBACKS = registry.counter(
+    'chatbot_llm_fallbacks_total', 'Gemini calls answered with the fallback message', ('mode',))
+LLM_QUEUE_SECONDS = registry.histogram(
+    'chatbot_llm_queue_seconds', 'Time Gemini calls waited for a free concurrency slot')
+LLM_GUARD_TRIPS = registry.counter(
+    'chatbot_llm_guard_trips_total', 'Gemini calls stopped by the guard (circuit_open, busy, timeout)', ('reason',))
+COALESCED_REQUESTS = registry.counter(
+    'chatbot_coalesced_requests_total',
+    'Lookups by single-flight group; followers shared a call already in flight instead of making their own',
+    ('flight', 'role'))
+PROMPT_TOKENS = registry.histogram(
+    'chatbot_prompt_tokens', 'Estimated tokens per Gemini prompt', buckets=(50, 100, 200, 400, 800, 1600, 3200, 6400))
@@ -0,0 +1,163 @@
+"""
+Order-number prefilter for the E-commerce Support Chatbot
+Answers "this order does not exist" for unknown 5-digit numbers without a
+database round trip, using a Bloom filter over known order IDs plus a
+short-lived negative cache for numbers the database has already rejected.
+"""
+
+import threading
+import time
+from mysql.connector import Error
+from cache import BloomFilter, TTLCache
+
+
+class OrderIdPrefilter:
+    """Membership prefilter over `orders.order_id`
+
+    connection_factory:  callable returning a DB connection (or None)
+    refresh_interval:    minimum seconds between the incremental refreshes a prefilter miss triggers
+    rebuild_interval:    seconds between full rebuilds (picks up deleted/back-dated orders)
+    negative_ttl:        seconds a database miss is remembered
+    """
+
+    def __init__(self, connection_factory, capacity=100000, error_rate=0.001,
+                 refresh_interval=1, rebuild_interval=3600, negative_ttl=30, negative_size=4096):
+        self.connection_factory = connection_factory
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.refresh_interval = refresh_interval
+        self.rebuild_interval = rebuild_interval
+        self.negative_cache = TTLCache(max_size=negative_size, ttl=negative_ttl)
+
+        self._bloom = None
+        self._watermark = None
+        self._last_refresh = 0.0
+        self._last_rebuild = 0.0
+        self._last_attempt = 0.0
+        self._lock = threading.Lock()
+
+        self.rejected = 0
+        self.passed = 0
+        self.refreshes = 0
+        self.rebuilds = 0
+        self.refresh_errors = 0
+
+    def _load(self, full):
+        """Load order IDs newer than the watermark (or all of them) into the filter"""
+        connection = self.connection_factory()
+        if not connection:
+            self.refresh_errors += 1
+            return False
+
+        try:
+            cursor = connection.cursor()
+            if full or self._watermark is None:
+                cursor.execute("SELECT order_id, order_date FROM orders")
+            else:
+                # >= so that orders sharing the watermark timestamp are not skipped
+                cursor.execute("SELECT order_id, order_date FROM orders WHERE order_date >= %s", (self._watermark,))
+            rows = cursor.fetchall()
+            cursor.close()
+        except Error as e:
+            print(f"Error refreshing order prefilter: {e}")
+            self.refresh_errors += 1
+            return False
+        finally:
+            connection.close()
+
+        if full or self._bloom is None:
+            bloom = BloomFilter(max(self.capacity, len(rows) * 2), self.error_rate)
+            watermark = None
+        else:
+            bloom = self._bloom
+            watermark = self._watermark
+
+        for order_id, order_date in rows:
+            if str(order_id) not in bloom:
+                bloom.add(str(order_id))
+            if order_date is not None and (watermark is None or order_date > watermark):
+                watermark = order_date
+
+        now = time.monotonic()
+        self._bloom = bloom
+        self._watermark = watermark
+        self._last_refresh = now
+        if full:
+            self._last_rebuild = now
+            self.rebuilds += 1
+        else:
+            self.refreshes += 1
+        return True
+
+    def refresh(self, full=False):
+        """Refresh the filter from the orders table"""
+        with self._lock:
+            return self._load(full or self._bloom is None)
+
+    def _maybe_refresh(self):
+        """Refresh if the filter is older than the refresh interval, at most one caller at a time
+
+        Once the filter is loaded, a caller arriving while a refresh is running
+        waits for it rather than answering from the filter as it was before.
+        Failed attempts are rate-limited too, so a database outage does not
+        queue every miss behind a connection timeout.
+        """
+        if not self._lock.acquire(blocking=self._bloom is not None):
+            return
+        try:
+            now = time.monotonic()
+            if now - self._last_attempt <= self.refresh_interval:
+                return
+            self._last_attempt = now
+            if self._bloom is None or now - self._last_rebuild > self.rebuild_interval:
+                self._load(full=True)
+            else:
+                self._load(full=False)
+        finally:
+            self._lock.release()
+
+    def might_exist(self, order_id):
+        """False only if order_id is known not to exist; True means "ask the database\""""
+        order_id = str(order_id)
+
+        if self._bloom is None or order_id not in self._bloom:
+            # The filter may simply be behind: catch up before rejecting
+            self._maybe_refresh()
+            if self._bloom is None:
+                # Never loaded (database down): fail open
+                self.passed += 1
+                return True
+            if order_id not in self._bloom:
+                self.rejected += 1
+                return False
+
+        if self.negative_cache.get(order_id):
+            self.rejected += 1
+            return False
+
+        self.passed += 1
+        return True
+
+    def record_miss(self, order_id):
+        """Remember that the database has no row for order_id"""
+        self.negative_cache.set(str(order_id), True)
+
+    def record_hit(self, order_id):
+        """Make sure an order the database returned is known to the filter"""
+        order_id = str(order_id)
+        self.negative_cache.invalidate(order_id)
+        if self._bloom is not None and order_id not in self._bloom:
+            self._bloom.add(order_id)
+
+    def stats(self):
+        """Snapshot of prefilter counters"""
+        return {
+            'bloom': self._bloom.stats() if self._bloom is not None else None,
+            'rejected': self.rejected,
+            'passed': self.passed,
+            'refreshes': self.refreshes,
+            'rebuilds': self.rebuilds,
+            'refresh_errors': self.refresh_errors,
+            'seconds_since_refresh': round(time.monotonic() - self._last_refresh, 1) if self._last_refresh else None,
+            'negative_cache': self.negative_cache.stats()
+        }
@@ -0,0 +1,227 @@
+"""
+In-memory order snapshot for the E-commerce Support Chatbot
+Holds the `orders JOIN users` projection that query_order reads as compact
+tuples of plain JSON types keyed by order_id, with a per-user index for
+query_user_orders, so order lookups need no database round trip. A background thread polls for
+rows whose change marker (order_date by default) is at or past the newest
+one already loaded, and reloads everything every rebuild_interval to pick up
+edits the marker does not see. Reads are refused once the snapshot is older
+than max_staleness, so callers fall back to MySQL instead of serving
+arbitrarily old data. Unless the marker also moves on UPDATE, only a full
+reload brings in edits, so the snapshot's age is counted from the last one.
+"""
+
+import re
+import threading
+import time
+from mysql.connector import Error
+from json_provider import plain_value
+
+SNAPSHOT_QUERY = """
+    SELECT o.*, u.name, u.email
+    FROM orders o
+    JOIN users u ON o.user_id = u.user_id
+"""
+
+# Joined from users; query_user_orders returns order columns only
+USER_COLUMNS = ('name', 'email')
+
+IDENTIFIER = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+
+class OrderSnapshot:
+    """Read-only in-memory copy of the orders table
+
+    connection_factory:  callable returning a DB connection (or None)
+    refresh_interval:    seconds between incremental refreshes
+    rebuild_interval:    seconds between full reloads (status edits, deletions, user changes)
+    max_staleness:       seconds without a successful refresh after which reads are refused
+    change_column:       orders column that moves forward when a row is added (and, if
+                         marker_tracks_updates, when it is changed)
+    marker_tracks_updates:  True if change_column is bumped on UPDATE (ON UPDATE CURRENT_TIMESTAMP);
+                         otherwise rebuild_interval is capped so that full reloads keep within max_staleness
+    """
+
+    def __init__(self, connection_factory, refresh_interval=5, rebuild_interval=300, max_staleness=60,
+                 change_column='order_date', marker_tracks_updates=False):
+        if not IDENTIFIER.match(change_column):
+            raise ValueError(f"change_column must be a column name, got {change_column!r}")
+
+        self.requested_rebuild_interval = rebuild_interval
+        if not marker_tracks_updates:
+            # Rebuilds are only noticed on a refresh tick, so leave one tick of headroom
+            rebuild_interval = min(rebuild_interval, max(refresh_interval, max_staleness - refresh_interval))
+
+        self.connection_factory = connection_factory
+        self.refresh_interval = refresh_interval
+        self.rebuild_interval = rebuild_interval
+        self.max_staleness = max_staleness
+        self.change_column = change_column
+        self.marker_tracks_updates = marker_tracks_updates
+
+        self._columns = None
+        self._index = {}
+        self._orders = {}  # order_id -> row tuple
+        self._by_user = {}  # user_id -> tuple of order_ids
+        self._watermark = None
+        self._last_refresh = 0.0
+        self._last_rebuild = 0.0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.hits = 0
+        self.misses = 0
+        self.stale_reads = 0
+        self.refreshes = 0
+        self.rebuilds = 0
+        self.refresh_errors = 0
+        self.rows_refreshed = 0
+
+    def _fetch(self, full):
+        connection = self.connection_factory()
+        if not connection:
+            return None
+
+        try:
+            cursor = connection.cursor()
+            if full or self._watermark is None:
+                cursor.execute(SNAPSHOT_QUERY)
+            else:
+                # >= so that rows sharing the watermark timestamp are not skipped
+                cursor.execute(SNAPSHOT_QUERY + f" WHERE o.{self.change_column} >= %s", (self._watermark,))
+            columns = tuple(column[0] for column in cursor.description)
+            rows = cursor.fetchall()
+            cursor.close()
+            return columns, rows
+        except Error as e:
+            print(f"Error refreshing order snapshot: {e}")
+            return None
+        finally:
+            connection.close()
+
+    def _load(self, full):
+        """Load every row (full) or the rows past the watermark into the snapshot"""
+        fetched = self._fetch(full)
+        if fetched is None:
+            self.refresh_errors += 1
+            return False
+        columns, rows = fetched
+        index = {name: position for position, name in enumerate(columns)}
+        order_pos, user_pos, marker_pos = index['order_id'], index['user_id'], index[self.change_column]
+
+        if full or self._columns != columns:
+            orders, by_user, watermark = {}, {}, None
+        else:
+            orders, by_user, watermark = self._orders, self._by_user, self._watermark
+
+        for row in rows:
+            marker = row[marker_pos]
+            row = tuple(plain_value(value) for value in row)
+            order_id = str(row[order_pos])
+            previous = orders.get(order_id)
+            if previous is not None and previous[user_pos] != row[user_pos]:
+                by_user[previous[user_pos]] = tuple(o for o in by_user[previous[user_pos]] if o != order_id)
+            if previous is None or previous[user_pos] != row[user_pos]:
+                by_user[row[user_pos]] = by_user.get(row[user_pos], ()) + (order_id,)
+            orders[order_id] = row
+            if marker is not None and (watermark is None or marker > watermark):
+                watermark = marker
+
+        # Readers always see a complete table: a rebuild swaps in new dicts at once
+        self._columns, self._index = columns, index
+        self._orders, self._by_user, self._watermark = orders, by_user, watermark
+        now = time.monotonic()
+        self._last_refresh = now
+        self.rows_refreshed += len(rows)
+        if full:
+            self._last_rebuild = now
+            self.rebuilds += 1
+        else:
+            self.refreshes += 1
+        return True
+
+    def refresh(self, full=False):
+        """Bring the snapshot up to date now"""
+        with self._lock:
+            return self._load(full or self._columns is None)
+
+    def _run(self):
+        while not self._stop.wait(self.refresh_interval):
+            full = time.monotonic() - self._last_rebuild >= self.rebuild_interval
+            self.refresh(full=full)
+
+    def start(self):
+        """Load the snapshot and start the refresh thread"""
+        if self.rebuild_interval < self.requested_rebuild_interval:
+            print(f"Order snapshot: {self.change_column} does not move on updates, rebuilding every "
+                  f"{self.rebuild_interval:g}s instead of {self.requested_rebuild_interval:g}s to stay within max_staleness")
+        self.refresh(full=True)
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='order-snapshot', daemon=True)
+            self._thread.start()
+
+    def close(self):
+        """Stop the refresh thread"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+
+    def staleness(self):
+        """Age of the data in seconds (None if never loaded)
+
+        Counted from the last successful refresh when the change marker sees
+        updates, otherwise from the last full reload, the only one that does.
+        """
+        loaded = self._last_refresh if self.marker_tracks_updates else self._last_rebuild
+        if not loaded:
+            return None
+        return time.monotonic() - loaded
+
+    def is_fresh(self):
+        """True if the snapshot may answer reads"""
+        age = self.staleness()
+        if age is not None and age <= self.max_staleness:
+            return True
+        self.stale_reads += 1
+        return False
+
+    def get(self, order_id):
+        """The order as a query_order row, or None if it is not in the snapshot"""
+        row = self._orders.get(str(order_id))
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return dict(zip(self._columns, row))
+
+    def user_orders(self, user_id):
+        """A user's orders, newest first, with the orders table's columns only"""
+        columns, orders = self._columns, self._orders
+        rows = [orders[order_id] for order_id in self._by_user.get(user_id, ()) if order_id in orders]
+        date_pos = self._index['order_date']
+        rows.sort(key=lambda row: (row[date_pos] is not None, row[date_pos]), reverse=True)
+        keep = [position for position, name in enumerate(columns) if name not in USER_COLUMNS]
+        return [{columns[position]: row[position] for position in keep} for row in rows]
+
+    def stats(self):
+        """Size, freshness and hit counters"""
+        age = self.staleness()
+        return {
+            'orders': len(self._orders),
+            'users': len(self._by_user),
+            'change_column': self.change_column,
+            'marker_tracks_updates': self.marker_tracks_updates,
+            'rebuild_interval': self.rebuild_interval,
+            'watermark': self._watermark.isoformat() if hasattr(self._watermark, 'isoformat') else self._watermark,
+            'staleness_s': round(age, 1) if age is not None else None,
+            'seconds_since_rebuild': round(time.monotonic() - self._last_rebuild, 1) if self._last_rebuild else None,
+            'max_staleness': self.max_staleness,
+            'hits': self.hits,
+            'misses': self.misses,
+            'stale_reads': self.stale_reads,
+            'refreshes': self.refreshes,
+            'rebuilds': self.rebuilds,
+            'refresh_errors': self.refresh_errors,
+            'rows_refreshed': self.rows_refreshed
+        }
@@ -0,0 +1,132 @@
+"""
+Compact Gemini prompts for the E-commerce Support Chatbot
+Builds prompts from a static preamble rendered once at import, a projection
+of the order data down to the fields an answer can use (no emails or
+internal IDs), and knowledge base snippets capped to a token budget. Tokens
+are estimated locally (about four characters per token) so no tokenizer
+call is needed, and the size of every prompt is recorded.
+"""
+
+import threading
+from datetime import datetime
+
+# Static, so identical across requests (and friendly to provider-side prefix caching)
+PREAMBLE = (
+    "You are a helpful e-commerce customer support assistant.\n"
+    "Please provide a helpful, concise, and friendly response. If you're providing order information, be specific.\n"
+    "If you need more information from the user, ask clearly. Keep responses under 3 sentences unless providing "
+    "detailed information.\n"
+)
+
+# Order columns worth showing the model; everything else (email, user_id, ...) is dropped
+ORDER_FIELDS = ('order_id', 'status', 'items', 'total_amount', 'order_date', 'estimated_delivery', 'tracking_number')
+
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token for English text)"""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _format_value(value):
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M')
+    return str(value)
+
+
+def project_record(record, fields=ORDER_FIELDS):
+    """One order as 'field: value' pairs, keeping only the listed fields that are set"""
+    return '; '.join(f"{field}: {_format_value(record[field])}"
+                     for field in fields if record.get(field) not in (None, ''))
+
+
+def project_db_info(db_info, fields=ORDER_FIELDS):
+    """Compact text for an order dict, a list of them, or anything else as given"""
+    if isinstance(db_info, dict):
+        if any(field in db_info for field in fields):
+            return project_record(db_info, fields)
+        return '; '.join(f"{key}: {_format_value(value)}" for key, value in db_info.items() if value is not None)
+    if isinstance(db_info, (list, tuple)):
+        return '\n'.join(project_db_info(item, fields) for item in db_info)
+    return str(db_info)
+
+
+def fit_snippets(snippets, budget):
+    """Knowledge base snippets (best first) that fit in `budget` tokens; the first is cut to fit if needed"""
+    kept = []
+    used = 0
+    for snippet in snippets:
+        tokens = estimate_tokens(snippet)
+        if used + tokens > budget:
+            if not kept and budget > 0:
+                cut = snippet[:budget * CHARS_PER_TOKEN].rsplit(' ', 1)[0]
+                kept.append(cut + '...')
+            break
+        kept.append(snippet)
+        used += tokens
+    return kept
+
+
+class PromptBuilder:
+    """Builds compact prompts and keeps size statistics
+
+    kb_token_budget:  tokens of knowledge base text allowed per prompt
+    fields:           order columns passed to the model
+    on_build:         called with the estimated token count of every prompt built
+    log_sizes:        print one line per prompt with its size by section
+    """
+
+    def __init__(self, kb_token_budget=400, fields=ORDER_FIELDS, on_build=None, log_sizes=False):
+        self.kb_token_budget = kb_token_budget
+        self.fields = tuple(fields)
+        self.on_build = on_build
+        self.log_sizes = log_sizes
+        self.preamble_tokens = estimate_tokens(PREAMBLE)
+        self._lock = threading.Lock()
+
+        self.built = 0
+        self.total_tokens = 0
+        self.max_tokens = 0
+        self.snippets_dropped = 0
+
+    def build(self, query, db_info=None, kb_info=None):
+        """Prompt for a customer question with optional order data and KB snippets"""
+        parts = [PREAMBLE]
+        db_text = project_db_info(db_info, self.fields) if db_info else ''
+        if db_text:
+            parts.append(f"\nOrder information:\n{db_text}\n")
+        kb_text = ''
+        if kb_info:
+            snippets = fit_snippets(list(kb_info), self.kb_token_budget)
+            kb_text = ' '.join(snippets)
+            parts.append(f"\nKnowledge base:\n{kb_text}\n")
+            dropped = len(kb_info) - len(snippets)
+        else:
+            dropped = 0
+        parts.append(f"\nCustomer question: {query}\n")
+        prompt = ''.join(parts)
+
+        tokens = estimate_tokens(prompt)
+        with self._lock:
+            self.built += 1
+            self.total_tokens += tokens
+            self.max_tokens = max(self.max_tokens, tokens)
+            self.snippets_dropped += dropped
+        if self.on_build:
+            self.on_build(tokens)
+        if self.log_sizes:
+            print(f"Prompt: {tokens} tokens (preamble {self.preamble_tokens}, order {estimate_tokens(db_text)}, "
+                  f"kb {estimate_tokens(kb_text)}, question {estimate_tokens(query)})")
+        return prompt
+
+    def stats(self):
+        """Prompt size counters (estimated tokens)"""
+        return {
+            'built': self.built,
+            'avg_tokens': round(self.total_tokens / self.built, 1) if self.built else 0.0,
+            'max_tokens': self.max_tokens,
+            'preamble_tokens': self.preamble_tokens,
+            'kb_token_budget': self.kb_token_budget,
+            'snippets_dropped': self.snippets_dropped
+        }
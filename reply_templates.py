@@ -0,0 +1,240 @@
+"""
+Reply templates for the E-commerce Support Chatbot
+Every sentence the bot sends is a template keyed by (intent, order status or
+conversation step), parsed and checked once when loaded instead of being
+rebuilt from inline f-strings on every request. Copy can be changed in a
+JSON file ({"intent.status": "text"}) that is hot-reloaded, and the JSON
+bodies of static replies are cached so those responses skip serialization.
+"""
+
+import json
+import os
+import string
+import threading
+import time
+import uuid
+
+# (intent, order status or step) -> text. '*' is used when no template matches the status.
+DEFAULT_TEMPLATES = {
+    ('order_not_found', None): "I couldn't find order #{order_id} in our system. Please double-check the order number or contact support at support@ecommerce.com",
+
+    ('track_order', 'ask'): "I can help track your order! Please provide your 5-digit order number.",
+    ('track_order', 'ask_again'): "I need a valid 5-digit order number to track your order. Could you please provide it?",
+    ('track_order', 'shipped'): "Your order #{order_id} ({items}) is on its way and should arrive within {delivery}.",
+    ('track_order', 'shipped_with_tracking'): "Your order #{order_id} ({items}) is on its way and should arrive within {delivery}. Tracking number: {tracking}",
+    ('track_order', 'processing'): "Your order #{order_id} ({items}) is currently being processed and will ship soon. Expected delivery: {delivery}.",
+    ('track_order', 'delivered'): "Your order #{order_id} ({items}) has been delivered. If you have any issues, please let me know!",
+    ('track_order', 'cancelled'): "Order #{order_id} ({items}) has been cancelled. If you need assistance, please contact our support team.",
+    ('track_order', '*'): "Your order #{order_id} status: {status}.",
+    ('track_orders', 'not_found'): "I couldn't find order #{order_id} in our system.",
+
+    ('return_item', 'ask'): "I can help with your return! Please provide your 5-digit order number.",
+    ('return_item', 'ask_again'): "Please provide your 5-digit order number so I can help you with the return.",
+    ('return_item', 'delivered'): "I found your order #{order_id} ({items}). You can return it within 30 days. Visit our Returns page: https://ecommerce.com/returns. Need help with the process?",
+    ('return_item', 'shipped'): "Your order #{order_id} ({items}) is currently in transit. Once delivered, you can return it within 30 days. Visit: https://ecommerce.com/returns",
+    ('return_item', 'cancelled'): "Order #{order_id} has already been cancelled. No return is needed.",
+    ('return_item', '*'): "Order #{order_id} ({items}) is still being processed. You can cancel it instead of returning. Would you like to cancel?",
+
+    ('cancel_order', 'ask'): "I can help cancel your order. Please provide your order number.",
+    ('cancel_order', 'ask_again'): "Please provide your 5-digit order number to cancel.",
+    ('cancel_order', 'shipped'): "Order #{order_id} ({items}) has already shipped. You'll need to refuse the delivery or initiate a return once received.",
+    ('cancel_order', 'cancelled'): "Order #{order_id} is already cancelled.",
+    ('cancel_order', '*'): "Order #{order_id} status is '{status}'. Please contact support for assistance.",
+    ('cancel_order', 'ticket_created'): "I've created a cancellation request for order #{order_id} ({items}). Our team will process it within 24 hours. Your ticket number is #{ticket_id}.",
+    ('cancel_order', 'ticket_pending'): "I've received your cancellation request for order #{order_id} ({items}). Our team will process it within 24 hours; there's no need to send it again.",
+    ('cancel_order', 'ticket_failed'): "I'm sorry, I couldn't create the cancellation request. Please contact support@ecommerce.com or call 1800-000-0000.",
+    ('cancel_order', 'declined'): "Okay, I won't cancel the order. Let me know if you need anything else!",
+
+    ('change_address', 'ask'): "I can help update the delivery address! Please provide your order number.",
+    ('change_address', 'ask_again'): "Please provide your 5-digit order number to update the address.",
+    ('change_address', 'processing'): "I found order #{order_id} ({items}). I'll forward your address change request to our support team. Would you like me to create a ticket?",
+    ('change_address', 'shipped'): "Order #{order_id} ({items}) has already shipped. The address cannot be changed now. You may need to contact the carrier or wait for delivery.",
+    ('change_address', '*'): "Order #{order_id} status is '{status}'. Address changes may not be possible.",
+    ('change_address', 'ticket_created'): "I've created ticket #{ticket_id} for your address change request. Our support team will contact you shortly to update the delivery address.",
+    ('change_address', 'ticket_pending'): "I've received your address change request. Our support team will contact you shortly to update the delivery address; there's no need to send it again.",
+    ('change_address', 'ticket_failed'): "I'm sorry, I couldn't create the ticket. Please contact support@ecommerce.com directly.",
+    ('change_address', 'declined'): "No problem! Is there anything else I can help you with?",
+}
+
+_formatter = string.Formatter()
+
+
+def parse_key(name):
+    """'track_order.shipped' -> ('track_order', 'shipped'), 'order_not_found' -> ('order_not_found', None)"""
+    intent, _, status = name.partition('.')
+    return intent, status or None
+
+
+class Template:
+    """One reply, parsed once; `fields` are the placeholders it uses"""
+
+    __slots__ = ('key', 'text', 'fields')
+
+    def __init__(self, key, text):
+        self.key = key
+        self.text = text
+        # Raises ValueError on malformed braces
+        self.fields = frozenset(field for _literal, field, _spec, _conv in _formatter.parse(text) if field)
+
+    def render(self, values):
+        return self.text.format_map(values) if self.fields else self.text
+
+
+class TemplateRegistry:
+    """Reply templates with optional hot-reloaded overrides
+
+    defaults:         dict of (intent, status) -> text; defines every key and its placeholders
+    path:             optional JSON file of {"intent.status": "text"} overriding the defaults
+    reload_interval:  seconds between checks of the file's modification time
+
+    An override naming an unknown key, or using a placeholder its default
+    does not provide, is reported and ignored, so a typo in the copy file can
+    never break a reply at request time.
+    """
+
+    def __init__(self, defaults, path=None, reload_interval=5):
+        self.path = path
+        self.reload_interval = reload_interval
+        self._defaults = {key: Template(key, text) for key, text in defaults.items()}
+
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._last_check = 0.0
+        self.reloads = 0
+        self.rejected = 0
+
+        self._templates = self._load()
+
+    def _load(self):
+        """Defaults overlaid with the valid overrides from `path`"""
+        templates = dict(self._defaults)
+        if not self.path or not os.path.exists(self.path):
+            return templates
+
+        try:
+            self._mtime = os.path.getmtime(self.path)
+            with open(self.path, 'r', encoding='utf-8') as f:
+                overrides = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error loading reply templates file {self.path}: {e}")
+            return templates
+
+        for name, text in overrides.items():
+            key = parse_key(name)
+            default = self._defaults.get(key)
+            try:
+                if default is None:
+                    raise ValueError("unknown template")
+                template = Template(key, text)
+                unknown = template.fields - default.fields
+                if unknown:
+                    raise ValueError(f"unknown placeholders {sorted(unknown)}")
+            except (ValueError, TypeError) as e:
+                print(f"Error in reply template {name!r}: {e}")
+                self.rejected += 1
+                continue
+            templates[key] = template
+        return templates
+
+    def reload_if_changed(self):
+        """Reload the overrides if the backing file changed since the last load"""
+        if not self.path:
+            return False
+
+        now = time.monotonic()
+        if now - self._last_check < self.reload_interval:
+            return False
+        self._last_check = now
+
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            mtime = None
+        if mtime == self._mtime:
+            return False
+
+        with self._lock:
+            self._templates = self._load()
+            self._mtime = mtime
+            self.reloads += 1
+        return True
+
+    def render(self, intent, status=None, /, **values):
+        """Text of the (intent, status) template, falling back to (intent, '*')"""
+        self.reload_if_changed()
+        templates = self._templates
+        template = templates.get((intent, status)) or templates[(intent, '*')]
+        return template.render(values)
+
+    def stats(self):
+        return {
+            'templates': len(self._templates),
+            'overridden': sum(1 for key, template in self._templates.items() if template is not self._defaults[key]),
+            'path': self.path,
+            'reloads': self.reloads,
+            'rejected': self.rejected
+        }
+
+
+class ResponseBodyCache:
+    """Serialized JSON bodies of chat replies that carry no per-request data
+
+    dumps:     the JSON serializer used for every other response
+    max_size:  bodies kept; the cache is emptied when it fills (after a copy change, say)
+
+    The body is keyed by the reply's contents, so an edited template simply
+    produces a new entry. Bodies with a session_id are serialized once around
+    a placeholder and the real ID is spliced in where `dumps` put it, so the
+    key order and separators are exactly those of a freshly serialized reply.
+    """
+
+    KEYS = frozenset({'message', 'type', 'needs_escalation', 'context', 'session_id'})
+
+    def __init__(self, dumps, max_size=1024):
+        self.dumps = dumps
+        self.max_size = max_size
+        self._bodies = {}
+        # Unique per cache so no reply text can contain it
+        self._placeholder = f"\x00{uuid.uuid4().hex}\x00"
+        self._placeholder_json = dumps(self._placeholder).encode('utf-8')
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, payload):
+        """UTF-8 JSON body for the payload, or None if it cannot be cached"""
+        if not self.KEYS.issuperset(payload):
+            return None
+        context = payload.get('context')
+        has_session = 'session_id' in payload
+        try:
+            key = (payload['message'], payload['type'], payload['needs_escalation'],
+                   None if context is None else tuple(sorted(context.items())), has_session)
+            parts = self._bodies.get(key)
+        except (KeyError, TypeError):
+            return None  # missing field or an unhashable context value
+
+        if parts is None:
+            self.misses += 1
+            if len(self._bodies) >= self.max_size:
+                self._bodies.clear()
+            if has_session:
+                body = self.dumps(dict(payload, session_id=self._placeholder)).encode('utf-8')
+                prefix, _, suffix = body.partition(self._placeholder_json)
+                parts = (prefix, suffix)
+            else:
+                parts = (self.dumps(payload).encode('utf-8'), None)
+            self._bodies[key] = parts
+        else:
+            self.hits += 1
+
+        prefix, suffix = parts
+        if suffix is None:
+            return prefix
+        return prefix + self.dumps(payload['session_id']).encode('utf-8') + suffix
+
+    def stats(self):
+        return {
+            'bodies': len(self._bodies),
+            'hits': self.hits,
+            'misses': self.misses
+        }
@@ -0,0 +1,202 @@
+"""
+Semantic response cache for the E-commerce Support Chatbot
+Catches rewordings that the exact-match cache misses ("tell me about the
+store" vs "tell me about your store", "open on sundays" vs "open on sunday").
+Questions are embedded locally with a hashed character n-gram vectorizer
+(CPU only, no network), kept as rows of a NumPy matrix, and matched with a
+single vectorized cosine-similarity top-1; the similarity threshold decides
+a hit. Character n-grams score "sunday" against "monday" highly in a long
+question and barely notice an added "not", so a candidate is also rejected
+when the two questions differ in their negations or in more than a few
+content words (inflections such as "wrap"/"wrapping" count as the same word).
+"""
+
+import re
+import threading
+import time
+import zlib
+import numpy as np
+from llm_cache import normalize_query
+from knowledge_base import stem
+
+_DIGITS = re.compile(r"\d+")
+
+# Words that do not change what is being asked; negations are deliberately absent
+FILLER_WORDS = frozenset("""
+a an the any some your my our you i me we us is are am be do does did can could would will
+please there this that these those hi hello hey just kindly tell know
+""".split())
+
+# Negations after normalize_query (which drops apostrophes)
+NEGATIONS = frozenset("""
+not no never nor without cannot cant dont doesnt didnt isnt arent wasnt werent wont wouldnt
+shouldnt couldnt havent hasnt
+""".split())
+
+
+def content_words(text):
+    """Words of a normalized question that carry its meaning"""
+    return tuple(word for word in normalize_query(text).split() if word not in FILLER_WORDS)
+
+
+def _same_word(a, b):
+    """Equal, or one an inflection of the other ("sunday"/"sundays", "wrap"/"wrapping")"""
+    return a == b or (min(len(a), len(b)) >= 4 and (a.startswith(b) or b.startswith(a)))
+
+
+def unmatched_words(words, other):
+    """Content words of either question with no counterpart in the other"""
+    return (sum(1 for a in words if not any(_same_word(a, b) for b in other))
+            + sum(1 for b in other if not any(_same_word(a, b) for a in words)))
+
+
+def negations(words):
+    """The negation words of a question"""
+    return frozenset(word for word in words if word in NEGATIONS)
+
+
+class HashingVectorizer:
+    """Hashed bag of character n-grams plus whole words, L2-normalized
+
+    Uses crc32 rather than hash() so that vectors are identical across
+    processes (Python salts str hashes per process).
+    """
+
+    def __init__(self, n_features=4096, ngram_range=(3, 5)):
+        self.n_features = n_features
+        self.ngram_range = ngram_range
+
+    def features(self, text):
+        """Yield the n-gram and word features of a question's stemmed content words"""
+        text = ' '.join(stem(word) for word in content_words(text))
+        for word in text.split():
+            yield 'w:' + word
+        padded = f" {text} "
+        low, high = self.ngram_range
+        for n in range(low, high + 1):
+            for i in range(len(padded) - n + 1):
+                yield padded[i:i + n]
+
+    def transform(self, text):
+        """Vector for one question"""
+        vec = np.zeros(self.n_features, dtype=np.float32)
+        for feature in self.features(text):
+            vec[zlib.crc32(feature.encode('utf-8')) % self.n_features] += 1.0
+        # Sublinear term frequency, then unit length so a dot product is the cosine
+        np.log1p(vec, out=vec)
+        norm = np.linalg.norm(vec)
+        if norm:
+            vec /= norm
+        return vec
+
+
+class SemanticCache:
+    """Fixed-capacity matrix of question vectors with LRU eviction
+
+    capacity:       maximum number of cached questions
+    threshold:      minimum cosine similarity for a hit (0-1)
+    ttl:            seconds an answer may be reused (keep in step with the exact-match cache)
+    max_unmatched:  content words the two questions may differ by; 1 allows an added
+                    word ("... for electronics items") but never a swapped one ("sunday"/"monday")
+
+    Entries only match questions with the same `scope` (a hash of the prompt
+    payload plus any numbers in the question), so "do you ship to 56001" is
+    never answered with the reply cached for "do you ship to 11001".
+    """
+
+    def __init__(self, capacity=512, threshold=0.9, ttl=3600, max_unmatched=1, n_features=4096):
+        self.capacity = capacity
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_unmatched = max_unmatched
+        self.vectorizer = HashingVectorizer(n_features=n_features)
+
+        self._matrix = np.zeros((capacity, n_features), dtype=np.float32)
+        self._scopes = [None] * capacity
+        self._words = [None] * capacity
+        self._responses = [None] * capacity
+        self._expires = np.zeros(capacity, dtype=np.float64)
+        self._last_used = np.zeros(capacity, dtype=np.int64)
+        self._size = 0
+        self._clock = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_scope(query, payload_key=''):
+        """Payload hash plus the numbers mentioned in the question"""
+        return payload_key + '|' + ','.join(_DIGITS.findall(query))
+
+    def get(self, query, scope=''):
+        """Return (response, similarity) of the closest cached question, or (None, best similarity)"""
+        vec = self.vectorizer.transform(query)
+        words = content_words(query)
+        now = time.monotonic()
+        with self._lock:
+            if not self._size:
+                self.misses += 1
+                return None, 0.0
+
+            sims = self._matrix[:self._size] @ vec
+            sims[self._expires[:self._size] <= now] = 0.0
+            candidates = np.flatnonzero(sims >= self.threshold)
+            # Best match first; usually zero or one candidate survives the threshold
+            for slot in candidates[np.argsort(sims[candidates])[::-1]]:
+                if self._scopes[slot] != scope:
+                    continue
+                other = self._words[slot]
+                if negations(words) != negations(other) or unmatched_words(words, other) > self.max_unmatched:
+                    self.rejected += 1  # similar spelling, different question ("sunday"/"monday", "not")
+                    continue
+                self._clock += 1
+                self._last_used[slot] = self._clock
+                self.hits += 1
+                return self._responses[slot], float(sims[slot])
+
+            self.misses += 1
+            return None, float(sims.max())
+
+    def set(self, query, response, scope=''):
+        """Cache a response, reusing an expired slot or evicting the least recently used question when full"""
+        vec = self.vectorizer.transform(query)
+        now = time.monotonic()
+        with self._lock:
+            if self._size < self.capacity:
+                slot = self._size
+                self._size += 1
+            else:
+                expired = np.flatnonzero(self._expires <= now)
+                if len(expired):
+                    slot = int(expired[0])
+                else:
+                    slot = int(np.argmin(self._last_used))
+                    self.evictions += 1
+
+            self._clock += 1
+            self._matrix[slot] = vec
+            self._scopes[slot] = scope
+            self._words[slot] = content_words(query)
+            self._responses[slot] = response
+            self._expires[slot] = now + self.ttl
+            self._last_used[slot] = self._clock
+
+    def stats(self):
+        """Hit/miss counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': self._size,
+                'capacity': self.capacity,
+                'threshold': self.threshold,
+                'ttl': self.ttl,
+                'max_unmatched': self.max_unmatched,
+                'hits': self.hits,
+                'misses': self.misses,
+                'rejected': self.rejected,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions
+            }
@@ -0,0 +1,162 @@
+"""
+Server-side conversation sessions for the E-commerce Support Chatbot
+The conversation context (the awaiting_* flags and pending order numbers)
+lives on the server, keyed by an opaque session ID, so clients only send the
+ID back with each message. The in-memory backend suits a single process; the
+MySQL backend (chat_sessions table) lets several worker processes serve the
+same conversation.
+"""
+
+import json
+import re
+import secrets
+import time
+from datetime import datetime, timedelta
+from mysql.connector import Error
+from cache import TTLCache
+
+_SESSION_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{16,64}$')
+
+
+class MemorySessionBackend:
+    """Sessions in a process-local TTL/LRU cache"""
+
+    name = 'memory'
+
+    def __init__(self, max_size=10000, ttl=1800):
+        self.cache = TTLCache(max_size=max_size, ttl=ttl)
+
+    def get(self, session_id):
+        context = self.cache.get(session_id)
+        return dict(context) if context is not None else None
+
+    def set(self, session_id, context):
+        self.cache.set(session_id, dict(context))
+
+    def delete(self, session_id):
+        self.cache.invalidate(session_id)
+
+    def stats(self):
+        return self.cache.stats()
+
+
+class MySQLSessionBackend:
+    """Sessions in the chat_sessions table, shared by every worker process
+
+    Expiry is sliding: each save pushes expires_at forward by ttl seconds.
+    Expired rows are ignored on read and deleted every purge_interval seconds.
+    """
+
+    name = 'mysql'
+
+    def __init__(self, connection_factory, ttl=1800, purge_interval=300):
+        self.connection_factory = connection_factory
+        self.ttl = ttl
+        self.purge_interval = purge_interval
+        self._last_purge = time.monotonic()
+        self.errors = 0
+        self.purged = 0
+
+    def get(self, session_id):
+        connection = self.connection_factory()
+        if not connection:
+            self.errors += 1
+            return None
+
+        try:
+            cursor = connection.cursor()
+            cursor.execute(
+                "SELECT context FROM chat_sessions WHERE session_id = %s AND expires_at > %s",
+                (session_id, datetime.now())
+            )
+            row = cursor.fetchone()
+            cursor.close()
+            return json.loads(row[0]) if row else None
+        except (Error, ValueError) as e:
+            print(f"Error loading session: {e}")
+            self.errors += 1
+            return None
+        finally:
+            connection.close()
+
+    def set(self, session_id, context):
+        connection = self.connection_factory()
+        if not connection:
+            self.errors += 1
+            return
+
+        try:
+            cursor = connection.cursor()
+            cursor.execute(
+                "REPLACE INTO chat_sessions (session_id, context, expires_at) VALUES (%s, %s, %s)",
+                (session_id, json.dumps(context, default=str), datetime.now() + timedelta(seconds=self.ttl))
+            )
+            if time.monotonic() - self._last_purge >= self.purge_interval:
+                self._last_purge = time.monotonic()
+                cursor.execute("DELETE FROM chat_sessions WHERE expires_at <= %s", (datetime.now(),))
+                self.purged += cursor.rowcount
+            connection.commit()
+            cursor.close()
+        except Error as e:
+            print(f"Error saving session: {e}")
+            self.errors += 1
+        finally:
+            connection.close()
+
+    def delete(self, session_id):
+        connection = self.connection_factory()
+        if not connection:
+            return
+
+        try:
+            cursor = connection.cursor()
+            cursor.execute("DELETE FROM chat_sessions WHERE session_id = %s", (session_id,))
+            connection.commit()
+            cursor.close()
+        except Error as e:
+            print(f"Error deleting session: {e}")
+        finally:
+            connection.close()
+
+    def stats(self):
+        return {'errors': self.errors, 'purged': self.purged}
+
+
+class SessionStore:
+    """Issues session IDs and loads/saves their conversation context"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.created = 0
+        self.resumed = 0
+        self.expired = 0
+
+    @staticmethod
+    def new_session_id():
+        return secrets.token_urlsafe(16)
+
+    def load(self, session_id=None):
+        """Return (session_id, context); unknown, expired or malformed IDs start a new session"""
+        if session_id and _SESSION_ID_PATTERN.match(str(session_id)):
+            context = self.backend.get(session_id)
+            if context is not None:
+                self.resumed += 1
+                return session_id, context
+            self.expired += 1
+
+        self.created += 1
+        return self.new_session_id(), {}
+
+    def save(self, session_id, context):
+        """Store the context a turn left behind"""
+        self.backend.set(session_id, context)
+
+    def stats(self):
+        """Session counters plus backend statistics"""
+        return {
+            'backend': self.backend.name,
+            'created': self.created,
+            'resumed': self.resumed,
+            'expired': self.expired,
+            'store': self.backend.stats()
+        }
@@ -0,0 +1,114 @@
+"""
+Request coalescing for the E-commerce Support Chatbot
+When many customers ask about the same order, or ask the same question, at
+the same moment, only the first request (the leader) runs the database query
+or Gemini call; the others (followers) wait for it and receive the same
+result or exception. Keys are released as soon as the call finishes, so this
+deduplicates only concurrent work; caching finished results is left to the
+caches in front of it.
+"""
+
+import asyncio
+import threading
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _Counters:
+    """Leader/follower counts shared by both flavours"""
+
+    def __init__(self, name, on_join=None):
+        self.name = name
+        self.on_join = on_join
+        self.leaders = 0
+        self.followers = 0
+
+    def _joined(self, leader):
+        if leader:
+            self.leaders += 1
+        else:
+            self.followers += 1
+        if self.on_join:
+            self.on_join(self.name, 'leader' if leader else 'follower')
+
+    def stats(self):
+        """Requests, backend calls made and the share of requests that were collapsed"""
+        requests = self.leaders + self.followers
+        return {
+            'requests': requests,
+            'backend_calls': self.leaders,
+            'shared': self.followers,
+            'collapse_ratio': round(self.followers / requests, 4) if requests else 0.0,
+            'in_flight': len(self._calls)
+        }
+
+
+class SingleFlight(_Counters):
+    """Thread version: concurrent do() calls with the same key share one fn call
+
+    name:     label for metrics and stats
+    on_join:  called with (name, 'leader' or 'follower') for every do() call
+    """
+
+    def __init__(self, name, on_join=None):
+        super().__init__(name, on_join)
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, *args, **kwargs):
+        """Return fn(*args, **kwargs), or the result of the identical call already running"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            self._joined(leader)
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+class AsyncSingleFlight(_Counters):
+    """asyncio version for one event loop: the shared call runs as its own task,
+    so a caller that goes away (client disconnect) does not cancel it for the rest"""
+
+    def __init__(self, name, on_join=None):
+        super().__init__(name, on_join)
+        self._calls = {}
+
+    def _finished(self, key, task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # retrieved here so an unawaited failure is not reported as lost
+
+    async def do(self, key, fn, *args, **kwargs):
+        """Await fn(*args, **kwargs), or the identical call already running"""
+        task = self._calls.get(key)
+        leader = task is None
+        if leader:
+            task = self._calls[key] = asyncio.ensure_future(fn(*args, **kwargs))
+            task.add_done_callback(lambda done, key=key: self._finished(key, done))
+        self._joined(leader)
+        return await asyncio.shield(task)
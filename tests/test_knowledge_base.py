@@ -0,0 +1,47 @@
+"""
+Knowledge base: key-term matches always count, body-only matches need a strong score
+
+Usage:
+    python -m pytest tests/
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from knowledge_base import KnowledgeBaseIndex
+
+ARTICLES = {
+    'return_policy': 'You can return items within 30 days of delivery. Items must be unused and in original packaging.',
+    'shipping_options': 'Standard shipping takes 5-7 business days. Express shipping is available for an extra charge.',
+    'warranty': 'All products come with a 1-year manufacturer warranty. Extended warranties are available at checkout.',
+    'refund_process': 'Refunds are processed within 5-7 business days after we receive your returned item.',
+    'store_faq': 'We accept UPI, credit cards and cash on delivery. Gift wrapping is free for orders above 999.',
+}
+
+
+def keys(results):
+    return [key for key, _text, _score in results]
+
+
+def test_key_term_match():
+    kb = KnowledgeBaseIndex(ARTICLES)
+    assert keys(kb.search('what is the warranty')) == ['warranty']
+
+
+def test_strong_body_only_match_is_returned():
+    kb = KnowledgeBaseIndex(ARTICLES)
+    assert keys(kb.search('is gift wrapping free')) == ['store_faq']
+
+
+def test_weak_body_only_match_is_dropped():
+    kb = KnowledgeBaseIndex(ARTICLES)
+    assert kb.search('is it available') == []
+    assert keys(kb.search('how do i return an item')) == ['return_policy']
+
+
+def test_body_min_score_is_configurable():
+    kb = KnowledgeBaseIndex(ARTICLES, body_min_score=float('inf'))
+    assert kb.search('is gift wrapping free') == []
+    assert keys(kb.search('what is the warranty')) == ['warranty']
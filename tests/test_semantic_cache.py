@@ -0,0 +1,95 @@
+"""
+Semantic cache: rewordings of a cached question hit, different questions miss
+
+Usage:
+    python -m pytest tests/
+"""
+
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from semantic_cache import SemanticCache
+
+PARAPHRASES = [
+    ("tell me about your store", "Tell me about the store!"),
+    ("are there any discounts for students", "are there discounts for students?"),
+    ("is the store open on sundays", "is the store open on sunday"),
+    ("do you offer gift wrapping", "do you offer gift wrap?"),
+    ("how long does shipping take", "How long will shipping take?"),
+    ("does your store offer gift cards", "does the store offer gift cards"),
+    ("what is your return policy for electronics", "what is your return policy for electronics items"),
+]
+
+NEAR_MISSES = [
+    ("is the store open on sunday", "is the store open on monday"),
+    ("is the store open on sunday mornings and holidays", "is the store open on monday mornings and holidays"),
+    ("do you have a store in mumbai", "do you have a store in delhi"),
+    ("what time does your store in mumbai open on weekdays", "what time does your store in delhi open on weekdays"),
+    ("do you ship internationally", "do you not ship internationally"),
+    ("can i pay with google pay", "can i not pay with google pay"),
+    ("do you sell gift cards", "do you sell gift cards online"),
+    ("is the store open on sunday", "is the store open on sunday night"),
+    ("can i return shoes", "can't i return shoes"),
+]
+
+
+@pytest.mark.parametrize('cached, asked', PARAPHRASES)
+def test_paraphrase_hits(cached, asked):
+    cache = SemanticCache(capacity=8)
+    cache.set(cached, 'answer')
+    response, similarity = cache.get(asked)
+    assert response == 'answer', similarity
+
+
+@pytest.mark.parametrize('cached, asked', NEAR_MISSES)
+def test_different_question_misses(cached, asked):
+    cache = SemanticCache(capacity=8)
+    cache.set(cached, 'answer')
+    assert cache.get(asked)[0] is None
+    assert cache.get(cached)[0] == 'answer'
+
+
+def test_threshold_decides_an_added_word():
+    cached, asked = "do you sell gift cards", "do you sell gift cards online"
+    loose = SemanticCache(capacity=8, threshold=0.8)
+    loose.set(cached, 'answer')
+    assert loose.get(asked)[0] == 'answer'
+
+    strict = SemanticCache(capacity=8, threshold=0.8, max_unmatched=0)
+    strict.set(cached, 'answer')
+    assert strict.get(asked)[0] is None
+
+
+def test_swapped_word_misses_at_any_threshold():
+    cache = SemanticCache(capacity=8, threshold=0.5)
+    cache.set("is the store open on sunday mornings and holidays", 'answer')
+    assert cache.get("is the store open on monday mornings and holidays")[0] is None
+    assert cache.get("is the store not open on sunday mornings and holidays")[0] is None
+
+
+def test_numbers_and_payload_scope_the_match():
+    cache = SemanticCache(capacity=8)
+    query = "do you ship to 56001"
+    cache.set(query, 'answer', cache.make_scope(query, 'payload'))
+    assert cache.get(query, cache.make_scope(query, 'payload'))[0] == 'answer'
+    assert cache.get(query, cache.make_scope(query, 'other'))[0] is None
+    other = "do you ship to 11001"
+    assert cache.get(other, cache.make_scope(other, 'payload'))[0] is None
+
+
+def test_entries_expire_after_ttl():
+    cache = SemanticCache(capacity=1, ttl=0.05)
+    cache.set("tell me about your store", 'answer')
+    assert cache.get("tell me about the store")[0] == 'answer'
+    time.sleep(0.1)
+    assert cache.get("tell me about the store")[0] is None
+
+    # An expired slot is reused without counting as an eviction
+    cache.set("do you offer gift wrapping", 'wrap')
+    assert cache.get("do you offer gift wrapping")[0] == 'wrap'
+    assert cache.stats()['evictions'] == 0
@@ -0,0 +1,206 @@
+"""
+Write-behind ticket queue for the E-commerce Support Chatbot
+Ticket inserts are queued and written by one background thread, a batch at a
+time in a single transaction, flushed when a batch fills up or the flush
+interval passes. Callers wait, with a bound, for their durable ticket ID, so
+many concurrent requests share one commit. A caller that stops waiting gets
+TICKET_PENDING: the ticket stays queued and is still written.
+"""
+
+import queue
+import threading
+import time
+from datetime import datetime
+from mysql.connector import Error
+
+INSERT_TICKET = """
+    INSERT INTO tickets (user_id, issue_description, status, created_date)
+    VALUES (%s, %s, 'open', %s)
+"""
+
+# create() result when the ticket is queued but not yet committed
+TICKET_PENDING = 'PENDING'
+
+_STOP = object()
+
+
+class PendingTicket:
+    """A queued ticket; `ticket_id` is set once its batch is committed"""
+
+    __slots__ = ('user_id', 'issue_description', 'created_date', 'ticket_id', '_done')
+
+    def __init__(self, user_id, issue_description):
+        self.user_id = user_id
+        self.issue_description = issue_description
+        self.created_date = datetime.now()
+        self.ticket_id = None
+        self._done = threading.Event()
+
+    @property
+    def done(self):
+        """True once the ticket's batch was committed or failed"""
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """Block until the ticket is written (or failed); returns its ID or None"""
+        self._done.wait(timeout)
+        return self.ticket_id
+
+
+class TicketWriteQueue:
+    """Batches ticket inserts from many request threads into few commits
+
+    batch_size:       flush as soon as this many tickets are queued
+    flush_interval:   seconds to wait for a batch to fill before flushing anyway
+    max_pending:      queue capacity; beyond it submit() blocks (backpressure)
+    enqueue_timeout:  seconds submit() blocks on a full queue before giving up
+    result_timeout:   seconds create() waits for the ticket ID before returning TICKET_PENDING
+    """
+
+    def __init__(self, connection_factory, batch_size=50, flush_interval=0.05, max_pending=1000,
+                 enqueue_timeout=1.0, result_timeout=5.0):
+        self.connection_factory = connection_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self.result_timeout = result_timeout
+
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._closed = False
+
+        self.enqueued = 0
+        self.written = 0
+        self.failed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.batches = 0
+        self.max_flush_ms = 0.0
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='ticket-writer', daemon=True)
+                    self._thread.start()
+
+    def submit(self, user_id, issue_description):
+        """Queue a ticket, returns a PendingTicket or None if the queue stayed full"""
+        if self._closed:
+            return None
+        self._ensure_started()
+
+        pending = PendingTicket(user_id, issue_description)
+        try:
+            self._queue.put(pending, timeout=self.enqueue_timeout)
+        except queue.Full:
+            self.rejected += 1
+            return None
+        self.enqueued += 1
+        return pending
+
+    def create(self, user_id, issue_description):
+        """Queue a ticket and wait for its ID
+
+        Returns None if the ticket was rejected or its batch failed, and
+        TICKET_PENDING if it is still queued when result_timeout passes.
+        """
+        pending = self.submit(user_id, issue_description)
+        if pending is None:
+            return None
+        ticket_id = pending.wait(self.result_timeout)
+        if not pending.done:
+            self.timed_out += 1
+            return TICKET_PENDING
+        return ticket_id
+
+    def _collect_batch(self, first):
+        """Gather up to batch_size tickets, waiting at most flush_interval"""
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                self._queue.put(_STOP)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                # Drain whatever was queued before close()
+                leftovers = []
+                while True:
+                    try:
+                        leftover = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if leftover is not _STOP:
+                        leftovers.append(leftover)
+                for start in range(0, len(leftovers), self.batch_size):
+                    self._write(leftovers[start:start + self.batch_size])
+                return
+            self._write(self._collect_batch(item))
+
+    def _write(self, batch):
+        """Insert one batch in a single transaction and commit"""
+        start = time.monotonic()
+        connection = self.connection_factory()
+        ticket_ids = []
+        try:
+            if not connection:
+                raise Error("No database connection")
+            cursor = connection.cursor()
+            # One INSERT per ticket so each gets the ID the server actually
+            # generated; the batch still shares one commit
+            for pending in batch:
+                cursor.execute(INSERT_TICKET, (pending.user_id, pending.issue_description, pending.created_date))
+                ticket_ids.append(cursor.lastrowid)
+            connection.commit()
+            cursor.close()
+            for pending, ticket_id in zip(batch, ticket_ids):
+                pending.ticket_id = ticket_id
+            self.written += len(batch)
+        except Error as e:
+            print(f"Error writing ticket batch: {e}")
+            self.failed += len(batch)
+        finally:
+            if connection:
+                connection.close()
+            for pending in batch:
+                pending._done.set()
+
+        self.batches += 1
+        self.max_flush_ms = max(self.max_flush_ms, (time.monotonic() - start) * 1000)
+
+    def close(self, timeout=10.0):
+        """Stop accepting tickets and flush everything already queued"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+
+    def stats(self):
+        """Queue depth and write counters"""
+        return {
+            'pending': self._queue.qsize(),
+            'enqueued': self.enqueued,
+            'written': self.written,
+            'failed': self.failed,
+            'rejected': self.rejected,
+            'timed_out': self.timed_out,
+            'batches': self.batches,
+            'avg_batch_size': round(self.written / self.batches, 2) if self.batches else 0.0,
+            'max_flush_ms': round(self.max_flush_ms, 3)
+        }
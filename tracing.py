@@ -0,0 +1,298 @@
+"""
+Request tracing and slow-request profiling for the E-commerce Support Chatbot
+Each traced request gets a trace ID and records a span for every DB, knowledge
+base and Gemini call made while handling it. A background sampler snapshots
+the stacks of the threads serving traced requests every few milliseconds.
+When a request runs longer than the slow threshold its spans are written as
+a Chrome trace-event file (chrome://tracing, Perfetto, speedscope) and its
+stack samples as folded stacks (flamegraph.pl, speedscope); faster requests
+are discarded. Only the newest max_traces traces are kept on disk.
+"""
+
+import functools
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime
+
+TRACE_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{8,64}$')
+
+_current_trace = ContextVar('current_trace', default=None)
+
+
+class Trace:
+    """Spans and stack samples for one request"""
+
+    def __init__(self, trace_id, name):
+        self.trace_id = trace_id
+        self.name = name
+        self.started_at = datetime.now()
+        self.start = time.perf_counter()
+        self.duration = None
+        self.spans = []  # (name, seconds after start, duration in seconds)
+        self.samples = Counter()  # folded stack -> sample count
+
+    def add_span(self, name, start, duration):
+        self.spans.append((name, start - self.start, duration))
+
+
+class _Span:
+    def __init__(self, trace, name):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.trace.add_span(self.name, self.start, time.perf_counter() - self.start)
+        return False
+
+
+class _NoSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+def span(name):
+    """Context manager recording a span on the current trace (a no-op when not tracing)"""
+    trace = _current_trace.get()
+    return _NO_SPAN if trace is None else _Span(trace, name)
+
+
+def add_span(name, start, duration):
+    """Record an already timed span on the current trace, if any"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_span(name, start, duration)
+
+
+def traced(name):
+    """Decorator recording each call of the function as a span"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            trace = _current_trace.get()
+            if trace is None:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                trace.add_span(name, start, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def fold_stack(frame):
+    """Render a frame and its callers as one folded-stack line (outermost first)"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class _UntracedRequest:
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_UNTRACED = _UntracedRequest()
+
+
+class _ActiveRequest:
+    """Context manager returned by Tracer.request"""
+
+    def __init__(self, tracer, trace, sample):
+        self.tracer = tracer
+        self.trace = trace
+        self.sample = sample
+
+    def __enter__(self):
+        self.token = _current_trace.set(self.trace)
+        self.thread_id = threading.get_ident()
+        if self.sample:
+            self.tracer._watch(self.thread_id, self.trace)
+        return self.trace
+
+    def __exit__(self, *exc_info):
+        _current_trace.reset(self.token)
+        if self.sample:
+            self.tracer._unwatch(self.thread_id)
+        self.tracer._finish(self.trace)
+        return False
+
+
+class Tracer:
+    """Opt-in request tracer with a stack sampler for slow requests
+
+    directory:        where slow-request traces and profiles are written
+    slow_ms:          requests at least this slow are written, the rest discarded
+    sample_interval:  seconds between stack samples of traced requests
+    max_traces:       traces kept in directory; the oldest are deleted beyond this
+    enabled:          when False, request() records nothing and costs next to nothing
+    """
+
+    def __init__(self, directory='traces', slow_ms=500.0, sample_interval=0.005, max_traces=200, enabled=True):
+        self.directory = directory
+        self.slow_ms = slow_ms
+        self.sample_interval = sample_interval
+        self.max_traces = max_traces
+        self.enabled = enabled
+
+        self._watched = {}  # thread id -> Trace
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+
+        self.traced = 0
+        self.slow = 0
+        self.written = 0
+        self.pruned = 0
+        self.samples = 0
+        self.write_errors = 0
+
+    def request(self, trace_id=None, name='request', sample=True):
+        """Context manager tracing one request; yields the Trace, or None when disabled
+
+        A trace_id supplied by the caller (e.g. an X-Trace-Id header) is kept if
+        it looks like an ID; otherwise a new one is generated. sample=False
+        records spans only, for requests that share their thread with others
+        (the ASGI event loop).
+        """
+        if not self.enabled:
+            return _UNTRACED
+        if not trace_id or not TRACE_ID_PATTERN.match(trace_id):
+            trace_id = uuid.uuid4().hex[:16]
+        return _ActiveRequest(self, Trace(trace_id, name), sample and self.sample_interval > 0)
+
+    def _watch(self, thread_id, trace):
+        with self._cond:
+            self._watched[thread_id] = trace
+            if self._thread is None and not self._closed:
+                self._thread = threading.Thread(target=self._sample_loop, name='trace-sampler', daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def _unwatch(self, thread_id):
+        with self._cond:
+            self._watched.pop(thread_id, None)
+
+    def _sample_loop(self):
+        while True:
+            with self._cond:
+                while not self._watched and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                # Sampled under the lock so no sample lands after a request is unwatched
+                frames = sys._current_frames()
+                for thread_id, trace in self._watched.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        trace.samples[fold_stack(frame)] += 1
+                        self.samples += 1
+                del frames
+            time.sleep(self.sample_interval)
+
+    def _finish(self, trace):
+        trace.duration = time.perf_counter() - trace.start
+        self.traced += 1
+        if trace.duration * 1000 < self.slow_ms:
+            return
+        self.slow += 1
+        try:
+            self._write(trace)
+        except OSError as e:
+            print(f"Error writing trace {trace.trace_id}: {e}")
+            self.write_errors += 1
+
+    def _write(self, trace):
+        """Write <timestamp>-<trace id>.json (and .folded if sampled), then apply the retention cap"""
+        base = os.path.join(self.directory, f"{trace.started_at:%Y%m%dT%H%M%S%f}-{trace.trace_id}")
+        events = [{
+            'name': trace.name, 'cat': 'request', 'ph': 'X', 'pid': 1, 'tid': 1,
+            'ts': 0, 'dur': round(trace.duration * 1e6, 1)
+        }]
+        for name, start, duration in trace.spans:
+            events.append({
+                'name': name, 'cat': 'span', 'ph': 'X', 'pid': 1, 'tid': 1,
+                'ts': round(start * 1e6, 1), 'dur': round(duration * 1e6, 1)
+            })
+        document = {
+            'traceEvents': events,
+            'displayTimeUnit': 'ms',
+            'otherData': {
+                'trace_id': trace.trace_id,
+                'name': trace.name,
+                'started_at': trace.started_at.isoformat(),
+                'duration_ms': round(trace.duration * 1000, 3),
+                'samples': sum(trace.samples.values())
+            }
+        }
+
+        with self._write_lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(base + '.json', 'w', encoding='utf-8') as f:
+                json.dump(document, f)
+            if trace.samples:
+                with open(base + '.folded', 'w', encoding='utf-8') as f:
+                    for stack, count in trace.samples.most_common():
+                        f.write(f"{stack} {count}\n")
+            self.written += 1
+            self._prune()
+
+    def _prune(self):
+        names = sorted(name[:-5] for name in os.listdir(self.directory) if name.endswith('.json'))
+        for base in names[:max(0, len(names) - self.max_traces)]:
+            for suffix in ('.json', '.folded'):
+                try:
+                    os.remove(os.path.join(self.directory, base + suffix))
+                except FileNotFoundError:
+                    pass
+            self.pruned += 1
+
+    def close(self):
+        """Stop the sampler thread"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+
+    def stats(self):
+        """Traced/slow/written counters"""
+        return {
+            'enabled': self.enabled,
+            'slow_ms': self.slow_ms,
+            'directory': self.directory,
+            'traced': self.traced,
+            'slow': self.slow,
+            'written': self.written,
+            'pruned': self.pruned,
+            'samples': self.samples,
+            'write_errors': self.write_errors
+        }